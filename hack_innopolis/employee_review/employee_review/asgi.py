@@ -5,6 +5,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
+
+Streaming endpoints (generate-summary/<id>/stream) should be served through
+this entry point, e.g. ``uvicorn employee_review.asgi:application``, so that
+open event streams do not each occupy a worker thread.
 """
 
 import os
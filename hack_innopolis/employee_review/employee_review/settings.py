@@ -27,10 +27,57 @@ DEBUG = True
 
 ALLOWED_HOSTS = ["*"]
 CORS_ALLOW_ALL_ORIGINS = True
+CORS_EXPOSE_HEADERS = ['ETag', 'Last-Modified']  # Для условных запросов из фронтенда
 CSRF_TRUSTED_ORIGINS = ["https://2a55-45-11-183-127.ngrok-free.app"]
 
 DATA_UPLOAD_MAX_NUMBER_FIELDS = 10000
 
+# Оценка тональности отзывов
+SENTIMENT_CACHE_SIZE = 10000  # Записей в LRU-кеше процесса
+SENTIMENT_WORKERS = 4  # Процессов в пуле, 1 — считать в текущем процессе
+SENTIMENT_POOL_MIN_BATCH = 64  # Минимальный размер пачки для пула процессов
+
+# Запросы к LLM
+LLM_API_URL = "https://vk-scoreworker-case.olymp.innopolis.university/generate"  # Можно заменить на локальный сервер-заглушку
+LLM_MAX_CONCURRENCY = 4  # Одновременных запросов при оценке частей отзывов
+LLM_CONNECT_TIMEOUT = 5  # Таймаут подключения, сек
+LLM_READ_TIMEOUT = 120  # Таймаут ожидания ответа, сек
+LLM_MAX_RETRIES = 3  # Повторов при 5xx и ошибках соединения
+LLM_BACKOFF = 1.0  # Базовая задержка между повторами, сек
+LLM_BACKOFF_MAX = 30.0  # Верхняя граница задержки, сек
+LLM_POOL_SIZE = 10  # Keep-alive соединений в пуле
+LLM_MAX_BATCH_SIZE = 4  # Независимых промтов в одном запросе generate
+LLM_CACHE_ENABLED = True  # Кеш ответов LLM по хешу промта и параметров генерации
+LLM_CACHE_TTL = 7 * 24 * 3600  # Время жизни записи кеша, сек
+LLM_CACHE_MAX_ENTRIES = 5000  # Записей в кеше, лишние вытесняются по давности использования
+
+SUMMARY_MAX_PROMPT_TOKENS = 6600  # Токенов (оценка) в одном промте с отзывами
+SUMMARY_LOCAL_SCORES = True  # Оценки частей объединяются взвешенным средним без запроса к LLM
+SUMMARY_LEASE_TTL = 300  # Срок аренды генерации сводки без продления, сек
+SUMMARY_LEASE_POLL_INTERVAL = 0.5  # Пауза между проверками у ожидающих запросов, сек
+
+# Плановое обновление сводок (python manage.py refresh_summaries)
+SUMMARY_REFRESH_WORKERS = 2  # Сотрудников, обрабатываемых одновременно
+SUMMARY_REFRESH_MAX_CALLS = None  # Бюджет запросов к LLM на запуск, None — без ограничения
+SUMMARY_REFRESH_MAX_TOKENS = None  # Бюджет токенов (оценка) на запуск, None — без ограничения
+
+# Кеш ответов API по сотрудникам. Ключи содержат версию данных сотрудника из БД, поэтому
+# LocMemCache корректен и при нескольких процессах; общий бэкенд (Redis) лишь повышает долю попаданий
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'employee-review',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+EMPLOYEE_CACHE_ALIAS = 'default'
+EMPLOYEE_CACHE_TTL = 300  # Время жизни закешированного ответа, сек
+
+# Фоновые задачи (python manage.py run_worker)
+JOB_WORKER_CONCURRENCY = 2  # Задач, выполняемых одновременно
+JOB_POLL_INTERVAL = 1.0  # Пауза между опросами пустой очереди, сек
+JOB_STALE_AFTER = 3600  # Через сколько секунд зависшая задача возвращается в очередь
+
 
 # Application definition
 
@@ -87,6 +134,10 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'timeout': 20,  # Ожидание блокировки записи: веб-процесс и обработчик задач пишут в одну БД
+            'transaction_mode': 'IMMEDIATE',  # Транзакции сразу берут блокировку записи, без взаимоблокировок при ее повышении
+        },
     }
 }
 
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Employee, Aspect, ReviewCreator, Feedback, GeneralSummary, AspectSummary
+from .models import Employee, Aspect, ReviewCreator, Feedback, FeedbackLengthStats, SentimentScore, GeneralSummary, AspectSummary, Job, SummaryLease, EmployeeDataVersion
 
 
 
@@ -32,6 +32,18 @@ class FeedbackAdmin(admin.ModelAdmin):
     text_short.short_description = "Текст отзыва"
 
 
+@admin.register(FeedbackLengthStats)
+class FeedbackLengthStatsAdmin(admin.ModelAdmin):
+    list_display = ('employee', 'count', 'mean', 'max_length', 'updated_at')
+    search_fields = ('employee__id',)
+
+
+@admin.register(SentimentScore)
+class SentimentScoreAdmin(admin.ModelAdmin):
+    list_display = ('digest', 'polarity', 'created_at')
+    search_fields = ('digest',)
+
+
 @admin.register(GeneralSummary)
 class GeneralSummaryAdmin(admin.ModelAdmin):
     list_display = ('id', 'employee', 'text_short')
@@ -51,3 +63,21 @@ class AspectSummaryAdmin(admin.ModelAdmin):
     def text_short(self, obj):
         return obj.text[:50] + ('...' if len(obj.text) > 50 else '')
     text_short.short_description = "Текст аспекта"
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'worker', 'created_at', 'finished_at')
+    list_filter = ('kind', 'status')
+
+
+@admin.register(SummaryLease)
+class SummaryLeaseAdmin(admin.ModelAdmin):
+    list_display = ('employee', 'kind', 'status', 'owner', 'coalesced', 'started_at', 'finished_at')
+    list_filter = ('kind', 'status')
+
+
+@admin.register(EmployeeDataVersion)
+class EmployeeDataVersionAdmin(admin.ModelAdmin):
+    list_display = ('employee', 'version', 'updated_at')
+    search_fields = ('employee__id',)
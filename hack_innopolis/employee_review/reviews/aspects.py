@@ -0,0 +1,42 @@
+import re
+
+from django.db.models import OuterRef, Subquery
+
+from .models import Aspect, AspectCatalogVersion, GeneralSummary
+
+
+
+def aspect_key(name):
+    # LLM может добавить нумерацию, кавычки или изменить регистр — сравниваем нормализованные названия
+    name = re.sub(r'^\s*\d+[.)]\s*', '', str(name))
+    return re.sub(r'\s+', ' ', name).strip(' "«»:.').lower()
+
+
+def match_aspect(name, aspects):
+    key = aspect_key(name)
+    return next((aspect for aspect in aspects if aspect_key(aspect.text) == key), None)
+
+
+def catalog_version():
+    return AspectCatalogVersion.current()
+
+
+def stale_aspects(general_summary, aspects=None):
+    # Аспекты, которых нет в сводке или которые изменились после ее построения
+    aspects = list(Aspect.objects.all()) if aspects is None else aspects
+    versions = {}
+    for aspect_summary in general_summary.aspect_summaries.all():
+        aspect = aspect_summary.aspect or match_aspect(aspect_summary.aspect_name, aspects)
+        if aspect is not None:
+            versions[aspect.id] = max(versions.get(aspect.id, 0), aspect_summary.aspect_version or 0)
+    return [aspect for aspect in aspects if versions.get(aspect.id, 0) < aspect.version]
+
+
+def outdated_summaries():
+    # Последние сводки сотрудников, построенные по более старой версии каталога
+    latest_ids = GeneralSummary.latest_for(OuterRef('employee')).values('id')[:1]
+    return (
+        GeneralSummary.objects.filter(id=Subquery(latest_ids), aspect_catalog_version__lt=catalog_version())
+        .select_related('employee')
+        .order_by('employee_id')
+    )
@@ -0,0 +1,78 @@
+import hashlib
+import threading
+from functools import wraps
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+
+from .models import EmployeeDataVersion
+from .response_cache import canonical_query
+
+
+
+class ConditionalStats:
+    # Сколько ответов отдано полностью и сколько заменено на 304 Not Modified
+
+    def __init__(self):
+        self.full = {}
+        self.not_modified = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, not_modified):
+        counters = self.not_modified if not_modified else self.full
+        with self._lock:
+            counters[endpoint] = counters.get(endpoint, 0) + 1
+
+    def as_dict(self):
+        with self._lock:
+            full, not_modified = sum(self.full.values()), sum(self.not_modified.values())
+            return {
+                "full": full,
+                "not_modified": not_modified,
+                "not_modified_ratio": round(not_modified / (full + not_modified), 4) if full + not_modified else 0.0,
+                "endpoints": {
+                    endpoint: {"full": self.full.get(endpoint, 0), "not_modified": self.not_modified.get(endpoint, 0)}
+                    for endpoint in sorted(set(self.full) | set(self.not_modified))
+                },
+            }
+
+
+conditional_stats = ConditionalStats()
+
+
+def employee_etag(employee_id, version, updated_at, endpoint, params):
+    # ETag различается по эндпоинту и параметрам запроса, иначе 304 одного URL подтверждал бы тело другого.
+    # Время изменения в микросекундах отличает пересозданного сотрудника с тем же id, у которого версия снова 1
+    stamp = int(updated_at.timestamp() * 1_000_000) if updated_at else 0
+    variant = hashlib.sha1(f"{endpoint}?{canonical_query(params)}".encode()).hexdigest()[:12]
+    return quote_etag(f"{employee_id}-{version}-{stamp}-{variant}")
+
+
+def conditional_by_employee(endpoint):
+    # Декоратор get-метода APIView с аргументом employee_id: ETag и Last-Modified по версии данных
+    # сотрудника. Если у клиента актуальная версия, возвращается 304 без основного запроса и сериализации
+    def decorator(get):
+        @wraps(get)
+        def wrapper(self, request, employee_id):
+            version, updated_at = EmployeeDataVersion.current(employee_id)
+            # Та же версия используется для ключа кеша ответов, чтобы ETag и тело всегда совпадали
+            request.employee_data_version = version
+            etag = employee_etag(employee_id, version, updated_at, endpoint, request.query_params)
+            last_modified = int(updated_at.timestamp()) if updated_at else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is not None:
+                conditional_stats.record(endpoint, not_modified=True)
+            else:
+                response = get(self, request, employee_id)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                conditional_stats.record(endpoint, not_modified=False)
+
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            return response
+        return wrapper
+    return decorator
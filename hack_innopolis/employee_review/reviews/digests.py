@@ -0,0 +1,7 @@
+import hashlib
+
+
+
+def text_digest(text):
+    # Хеш содержимого текста: ключ для кеша тональности и поиска дубликатов
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
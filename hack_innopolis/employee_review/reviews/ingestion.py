@@ -0,0 +1,237 @@
+import codecs
+import csv
+import json
+from collections import defaultdict
+
+from django.db import transaction
+
+from .digests import text_digest
+from .models import Employee, EmployeeDataVersion, Feedback, FeedbackLengthStats, ReviewCreator
+from .sentiment import sentiment_scorer
+from .serializers import FeedbackSerializer
+from .weights import combine_weights, emotion_weight, prefix_std_weights
+
+
+
+BULK_BATCH_SIZE = 500  # Размер пачки для bulk_create
+QUERY_CHUNK_SIZE = 500  # Ограничение на число параметров в IN (...) для SQLite
+UPLOAD_BATCH_SIZE = 1000  # Строк потоковой загрузки на одну транзакцию
+MAX_REPORTED_ERRORS = 1000  # Ошибок в ответе, остальные только считаются
+
+CSV_FIELDS = ['ID_reviewer', 'ID_under_review', 'review']
+
+CREATED = 'created'
+DUPLICATE = 'duplicate'
+REJECTED = 'rejected'
+
+
+def chunked(items, size):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def validate_feedback_rows(items):
+    # Валидация каждой строки отдельно, чтобы ошибка в одной не отклоняла всю загрузку
+    rows = []
+    results = [None] * len(items)
+    for index, item in enumerate(items):
+        serializer = FeedbackSerializer(data=item)
+        if not serializer.is_valid():
+            results[index] = {"status": REJECTED, "errors": serializer.errors}
+            continue
+
+        data = serializer.validated_data
+        if data.get('ID_reviewer') is None or data.get('ID_under_review') is None:
+            results[index] = {"status": REJECTED, "errors": ["Не указаны ID_reviewer или ID_under_review."]}
+            continue
+
+        rows.append((index, data['ID_reviewer'], data['ID_under_review'], data['review']))
+    return rows, results
+
+
+def ensure_exist(model, ids):
+    # Аналог get_or_create для множества ID за несколько запросов
+    existing = set()
+    for chunk in chunked(ids, QUERY_CHUNK_SIZE):
+        existing.update(model.objects.filter(id__in=chunk).values_list('id', flat=True))
+    missing = [model(id=obj_id) for obj_id in ids if obj_id not in existing]
+    model.objects.bulk_create(missing, batch_size=BULK_BATCH_SIZE, ignore_conflicts=True)
+
+
+def existing_feedback_keys(employee_ids):
+    # Ключи уже сохраненных отзывов: читаются только хеши, без текстов
+    keys = {}
+    for chunk in chunked(employee_ids, QUERY_CHUNK_SIZE):
+        feedbacks = Feedback.objects.filter(employee_id__in=chunk).values_list(
+            'id', 'employee_id', 'review_creator_id', 'digest'
+        )
+        for feedback_id, employee_id, reviewer_id, digest in feedbacks:
+            keys.setdefault((employee_id, reviewer_id, digest), feedback_id)
+    return keys
+
+
+def ingest_feedback_bulk(items):
+    # Пакетная загрузка отзывов. Возвращает результат по каждой строке
+    # в том же порядке: created / duplicate / rejected.
+    rows, results = validate_feedback_rows(items)
+    if not rows:
+        return results
+
+    # Тональность оценивается одной пачкой до начала транзакции, чтобы не держать блокировку записи
+    polarities = dict(zip(
+        (row[0] for row in rows),
+        sentiment_scorer.score_batch([row[3] for row in rows]),
+    ))
+
+    with transaction.atomic():
+        employee_ids = {employee_id for _, _, employee_id, _ in rows}
+        reviewer_ids = {reviewer_id for _, reviewer_id, _, _ in rows}
+        ensure_exist(Employee, employee_ids)
+        ensure_exist(ReviewCreator, reviewer_ids)
+
+        # Отсеиваем дубликаты: как уже сохраненные, так и повторы внутри загрузки
+        seen = existing_feedback_keys(employee_ids)
+        new_rows = []
+        pending = {}
+        digests = {index: text_digest(text) for index, _, _, text in rows}
+        for index, reviewer_id, employee_id, text in rows:
+            key = (employee_id, reviewer_id, digests[index])
+            if key in seen:
+                results[index] = {"status": DUPLICATE, "id": seen[key]}
+            elif key in pending:
+                results[index] = {"status": DUPLICATE, "duplicate_of": pending[key]}
+            else:
+                pending[key] = index
+                new_rows.append((index, reviewer_id, employee_id, text))
+
+        # Веса считаются одним векторным проходом на сотрудника
+        by_employee = defaultdict(list)
+        for row in new_rows:
+            by_employee[row[2]].append(row)
+
+        stats = {
+            item.employee_id: item.as_tuple()
+            for chunk in chunked(by_employee.keys(), QUERY_CHUNK_SIZE)
+            for item in FeedbackLengthStats.objects.filter(employee_id__in=chunk)
+        }
+        weights = {}
+        for employee_id, employee_rows in by_employee.items():
+            count, mean, m2, max_length = stats.get(employee_id, (0, 0.0, 0.0, 0))
+            std_weights = prefix_std_weights(count, mean, m2, max_length, [len(row[3]) for row in employee_rows])
+            emotion_weights = [emotion_weight(polarities[row[0]]) for row in employee_rows]
+            is_self_review = [row[1] == employee_id for row in employee_rows]
+            for row, weight in zip(employee_rows, combine_weights(std_weights, emotion_weights, is_self_review)):
+                weights[row[0]] = float(weight)
+
+        feedbacks = [
+            Feedback(
+                text=text,
+                employee_id=employee_id,
+                review_creator_id=reviewer_id,
+                is_self_review=(employee_id == reviewer_id),
+                weight=weights[index],
+                text_length=len(text),
+                digest=digests[index],
+            )
+            for index, reviewer_id, employee_id, text in new_rows
+        ]
+        Feedback.objects.bulk_create(feedbacks, batch_size=BULK_BATCH_SIZE)
+
+        for employee_id, employee_rows in by_employee.items():
+            FeedbackLengthStats.add_lengths(employee_id, [len(row[3]) for row in employee_rows])
+        EmployeeDataVersion.changed(by_employee.keys())
+
+    for (index, _, _, _), feedback in zip(new_rows, feedbacks):
+        results[index] = {"status": CREATED, "id": feedback.id}
+
+    # Дубликаты внутри загрузки ссылаются на созданный отзыв
+    for result in results:
+        if result["status"] == DUPLICATE and "duplicate_of" in result:
+            result["id"] = results[result.pop("duplicate_of")]["id"]
+
+    return results
+
+
+def summarize_results(results):
+    counts = {CREATED: 0, DUPLICATE: 0, REJECTED: 0}
+    for result in results:
+        counts[result["status"]] += 1
+    return counts
+
+
+def iter_ndjson_rows(lines):
+    # Пары (номер строки, данные или None, ошибка или None)
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line), None
+        except json.JSONDecodeError as e:
+            yield line_number, None, f"Некорректный JSON: {e}"
+
+
+def iter_csv_rows(lines):
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        return
+    header = [column.strip() for column in header]
+    if not set(CSV_FIELDS) <= set(header):
+        yield reader.line_num, None, f"Ожидаются колонки: {', '.join(CSV_FIELDS)}"
+        return
+
+    for row in reader:
+        if not any(row):
+            continue
+        if len(row) != len(header):
+            yield reader.line_num, None, f"Ожидалось {len(header)} колонок, получено {len(row)}"
+            continue
+        yield reader.line_num, dict(zip(header, row)), None
+
+
+def ingest_feedback_stream(byte_lines, file_format='ndjson', batch_size=UPLOAD_BATCH_SIZE):
+    # Потоковая загрузка: строки читаются по мере поступления и сохраняются
+    # пачками фиксированного размера, поэтому память не зависит от размера файла
+    lines = codecs.iterdecode(byte_lines, 'utf-8-sig')
+    rows = iter_csv_rows(lines) if file_format == 'csv' else iter_ndjson_rows(lines)
+
+    counts = {CREATED: 0, DUPLICATE: 0, REJECTED: 0}
+    errors = []
+    rows_total = 0
+
+    def report(line_number, error):
+        counts[REJECTED] += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({"line": line_number, "errors": error})
+
+    def flush(batch):
+        for (line_number, _), result in zip(batch, ingest_feedback_bulk([item for _, item in batch])):
+            if result["status"] == REJECTED:
+                report(line_number, result["errors"])
+            else:
+                counts[result["status"]] += 1
+
+    batch = []
+    try:
+        for line_number, item, error in rows:
+            rows_total += 1
+            if error:
+                report(line_number, error)
+                continue
+            batch.append((line_number, item))
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+    except (UnicodeDecodeError, csv.Error) as e:
+        report(rows_total + 1, f"Не удалось прочитать файл: {e}")
+
+    if batch:
+        flush(batch)
+
+    return {
+        "rows": rows_total,
+        "counts": counts,
+        "errors": sorted(errors, key=lambda error: error["line"]),
+        "errors_truncated": max(counts[REJECTED] - len(errors), 0),
+    }
@@ -0,0 +1,197 @@
+import os
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from .models import Employee, Job
+
+
+
+JOB_WORKER_CONCURRENCY = getattr(settings, 'JOB_WORKER_CONCURRENCY', 2)  # Задач, выполняемых одновременно
+JOB_POLL_INTERVAL = getattr(settings, 'JOB_POLL_INTERVAL', 1.0)  # Пауза между опросами пустой очереди, сек
+JOB_STALE_AFTER = getattr(settings, 'JOB_STALE_AFTER', 3600)  # Через сколько секунд зависшая задача возвращается в очередь
+
+JOB_HANDLERS = {}
+
+
+class JobError(Exception):
+    pass
+
+
+def job_handler(kind):
+    def register(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return register
+
+
+@job_handler('ingest_feedback')
+def ingest_feedback_job(payload):
+    from .ingestion import ingest_feedback_bulk, summarize_results
+
+    results = ingest_feedback_bulk(payload.get('items', []))
+    return {"status": "success", "counts": summarize_results(results), "results": results}
+
+
+@job_handler('generate_summary')
+def generate_summary_job(payload):
+    from .summary import SummaryError, SummaryGenerator
+
+    try:
+        employee = Employee.objects.get(id=payload['employee_id'])
+    except Employee.DoesNotExist:
+        raise JobError("Сотрудник не найден.")
+
+    try:
+        return SummaryGenerator(use_cache=payload.get('use_cache', True)).generate(employee, full=payload.get('full', False))
+    except SummaryError as e:
+        raise JobError(e.detail)
+
+
+@job_handler('refresh_aspects')
+def refresh_aspects_job(payload):
+    from .summary import SummaryError, SummaryGenerator
+
+    try:
+        employee = Employee.objects.get(id=payload['employee_id'])
+    except Employee.DoesNotExist:
+        raise JobError("Сотрудник не найден.")
+
+    try:
+        return SummaryGenerator(use_cache=payload.get('use_cache', True)).refresh_aspects(employee)
+    except SummaryError as e:
+        raise JobError(e.detail)
+
+
+@job_handler('refresh_summaries')
+def refresh_summaries_job(payload):
+    from .scheduler import SummaryRefreshScheduler
+
+    scheduler = SummaryRefreshScheduler.start(
+        max_calls=payload.get('max_calls'),
+        max_tokens=payload.get('max_tokens'),
+        limit=payload.get('limit'),
+        full=payload.get('full', False),
+    )
+    run = scheduler.execute()
+    return {
+        "run_id": run.id,
+        "status": run.status,
+        "done": len(run.done),
+        "failed": run.failed,
+        "llm_calls": run.llm_calls,
+        "llm_tokens": run.llm_tokens,
+        **scheduler.throughput(),
+    }
+
+
+def enqueue(kind, payload):
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Неизвестный тип задачи: {kind}")
+    return Job.objects.create(kind=kind, payload=payload)
+
+
+def serialize_job(job):
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "result": job.result,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+def claim_next_job(worker_name):
+    # Атомарный захват: задачу получает тот, чей UPDATE ... WHERE status='queued' сработал первым
+    while True:
+        job_id = Job.objects.filter(status=Job.QUEUED).order_by('id').values_list('id', flat=True).first()
+        if job_id is None:
+            return None
+        claimed = Job.objects.filter(id=job_id, status=Job.QUEUED).update(
+            status=Job.RUNNING, worker=worker_name, started_at=timezone.now()
+        )
+        if claimed:
+            return Job.objects.get(id=job_id)
+
+
+def requeue_stale_jobs(stale_after=JOB_STALE_AFTER):
+    # Задачи, оставшиеся в статусе running после падения обработчика
+    threshold = timezone.now() - timedelta(seconds=stale_after)
+    return Job.objects.filter(status=Job.RUNNING, started_at__lt=threshold).update(
+        status=Job.QUEUED, worker="", started_at=None
+    )
+
+
+def run_job(job):
+    handler = JOB_HANDLERS.get(job.kind)
+    try:
+        if handler is None:
+            raise JobError(f"Неизвестный тип задачи: {job.kind}")
+        job.result = handler(job.payload)
+        job.status = Job.DONE
+    except JobError as e:
+        job.status = Job.FAILED
+        job.error = str(e)
+    except Exception:
+        job.status = Job.FAILED
+        job.error = traceback.format_exc()
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'result', 'error', 'finished_at'])
+    return job
+
+
+class Worker:
+    # Локальный обработчик очереди: несколько потоков, без внешнего брокера
+
+    def __init__(self, concurrency=JOB_WORKER_CONCURRENCY, poll_interval=JOB_POLL_INTERVAL, log=print):
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = poll_interval
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self.log = log
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self, once=False):
+        requeued = requeue_stale_jobs()
+        if requeued:
+            self.log(f"Возвращено в очередь зависших задач: {requeued}")
+
+        running = set()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='job-worker') as executor:
+            while not self._stop.is_set():
+                while len(running) < self.concurrency:
+                    job = claim_next_job(self.name)
+                    if job is None:
+                        break
+                    self.log(f"Задача {job.id} ({job.kind}) запущена")
+                    running.add(executor.submit(self._execute, job))
+
+                if once and not running:
+                    break
+
+                if running:
+                    _, running = wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                else:
+                    close_old_connections()
+                    time.sleep(self.poll_interval)
+
+    def _execute(self, job):
+        started = time.monotonic()
+        try:
+            job = run_job(job)
+            self.log(f"Задача {job.id} ({job.kind}) завершена со статусом {job.status} за {time.monotonic() - started:.1f} с")
+        finally:
+            # У каждого потока свое соединение с БД
+            connection.close()
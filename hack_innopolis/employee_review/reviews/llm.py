@@ -0,0 +1,206 @@
+import json
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from .llm_cache import LLM_CACHE_ENABLED, cache_key, llm_response_cache
+
+
+
+LLM_API_URL = getattr(settings, 'LLM_API_URL', "https://vk-scoreworker-case.olymp.innopolis.university/generate")
+LLM_CONNECT_TIMEOUT = getattr(settings, 'LLM_CONNECT_TIMEOUT', 5)  # Таймаут подключения, сек
+LLM_READ_TIMEOUT = getattr(settings, 'LLM_READ_TIMEOUT', 120)  # Таймаут ожидания ответа, сек
+LLM_MAX_RETRIES = getattr(settings, 'LLM_MAX_RETRIES', 3)  # Повторов при 5xx и ошибках соединения
+LLM_BACKOFF = getattr(settings, 'LLM_BACKOFF', 1.0)  # Базовая задержка между повторами, сек
+LLM_BACKOFF_MAX = getattr(settings, 'LLM_BACKOFF_MAX', 30.0)  # Верхняя граница задержки, сек
+LLM_POOL_SIZE = getattr(settings, 'LLM_POOL_SIZE', 10)  # Keep-alive соединений в пуле
+LLM_MAX_BATCH_SIZE = getattr(settings, 'LLM_MAX_BATCH_SIZE', 4)  # Промтов в одном запросе generate
+LLM_CHARS_PER_TOKEN = getattr(settings, 'LLM_CHARS_PER_TOKEN', 3)  # Символов на токен для грубой оценки
+
+DEFAULT_SYSTEM_PROMPT = "You are a helpful assistant."
+DEFAULT_MAX_TOKENS = 2000
+DEFAULT_TEMPERATURE = 0.3
+
+
+def estimate_tokens(text):
+    # Грубая оценка числа токенов без токенизатора модели
+    return max(1, len(text) // LLM_CHARS_PER_TOKEN) if text else 0
+
+
+class LLMUsage:
+    # Счетчики обращений к LLM (попадания в кеш не учитываются)
+
+    def __init__(self):
+        self.requests = 0
+        self.prompts = 0
+        self.tokens = 0
+        self._lock = threading.Lock()
+
+    def record(self, prompts, response):
+        tokens = sum(estimate_tokens(prompt) for prompt in prompts)
+        tokens += estimate_tokens(response if isinstance(response, str) else json.dumps(response, ensure_ascii=False))
+        with self._lock:
+            self.requests += 1
+            self.prompts += len(prompts)
+            self.tokens += tokens
+
+    def as_dict(self):
+        with self._lock:
+            return {"requests": self.requests, "prompts": self.prompts, "tokens": self.tokens}
+
+
+class LLMClient:
+    # Общий клиент LLM API: пул keep-alive соединений, таймауты и повторы с экспоненциальной задержкой и джиттером
+
+    def __init__(self, url=LLM_API_URL, connect_timeout=LLM_CONNECT_TIMEOUT, read_timeout=LLM_READ_TIMEOUT,
+                 max_retries=LLM_MAX_RETRIES, backoff=LLM_BACKOFF, backoff_max=LLM_BACKOFF_MAX, pool_size=LLM_POOL_SIZE):
+        self.url = url
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+        self.usage = LLMUsage()  # Все обращения через этот клиент
+
+    def generate(self, prompt, system_prompt=DEFAULT_SYSTEM_PROMPT, max_tokens=DEFAULT_MAX_TOKENS, temperature=DEFAULT_TEMPERATURE, use_cache=True, usage=None):
+        # Возвращает JSON-ответ API, {"text_response": ...} для текстового ответа или {"error": ...}
+        return self.generate_batch(
+            [prompt], system_prompt=system_prompt, max_tokens=max_tokens, temperature=temperature, use_cache=use_cache, usage=usage
+        )[0]
+
+    def generate_batch(self, prompts, system_prompt=DEFAULT_SYSTEM_PROMPT, max_tokens=DEFAULT_MAX_TOKENS,
+                       temperature=DEFAULT_TEMPERATURE, use_cache=True, max_batch_size=LLM_MAX_BATCH_SIZE, usage=None):
+        # usage — дополнительный счетчик обращений вызывающей стороны (например, бюджет планировщика)
+        # Независимые промты объединяются в один запрос generate (не больше max_batch_size),
+        # ответы возвращаются в порядке промтов. Кеш работает для каждого промта отдельно
+        params = {"system_prompt": system_prompt, "max_tokens": max_tokens, "temperature": temperature}
+        results = [None] * len(prompts)
+
+        # use_cache=False — ответ запрашивается заново, но результат все равно обновляет кеш
+        keys = [cache_key(self.url, self.request_data([prompt], **params)) if LLM_CACHE_ENABLED else None for prompt in prompts]
+        pending = []
+        for index, key in enumerate(keys):
+            cached = llm_response_cache.get(key) if key and use_cache else None
+            if cached is not None:
+                results[index] = self.normalize_response(cached)  # Записи, сохраненные до нормализации
+            else:
+                pending.append(index)
+
+        batch_size = max(1, max_batch_size)
+        for start in range(0, len(pending), batch_size):
+            group = pending[start:start + batch_size]
+            responses = self.request_batch([prompts[index] for index in group], params, usage)
+            for index, response in zip(group, responses):
+                results[index] = response
+                if keys[index] and not (isinstance(response, dict) and "error" in response):
+                    llm_response_cache.set(keys[index], response)
+        return results
+
+    def request_batch(self, prompts, params, usage=None):
+        # Ответы на одиночный и пакетный запрос приводятся к одному виду, иначе попадание в кеш
+        # возвращало бы разные структуры в зависимости от того, каким путем была сделана запись
+        if len(prompts) == 1:
+            return [self.normalize_response(self.request(self.request_data(prompts, **params), usage))]
+
+        response = self.request(self.request_data(prompts, **params), usage)
+        if isinstance(response, dict) and "error" in response:
+            return [response] * len(prompts)
+        if isinstance(response, list) and len(response) == len(prompts):
+            return [self.unpack_batch_item(item) for item in response]
+
+        # Ответ нельзя сопоставить с промтами — повторяем по одному
+        print("Ответ LLM API на пакетный запрос не сопоставляется с промтами, отправляем по одному")
+        return [self.normalize_response(self.request(self.request_data([prompt], **params), usage)) for prompt in prompts]
+
+    @staticmethod
+    def request_data(prompts, system_prompt, max_tokens, temperature):
+        return {
+            "prompt": list(prompts),
+            "apply_chat_template": True,
+            "system_prompt": system_prompt,
+            "max_tokens": max_tokens,
+            "n": 1,
+            "temperature": temperature
+        }
+
+    @classmethod
+    def normalize_response(cls, response):
+        # Ответ на один промт в виде элемента пакетного ответа: список из одного ответа
+        # разворачивается, строка разбирается как JSON или становится {"text_response": ...}
+        if isinstance(response, list) and len(response) == 1:
+            response = response[0]
+        return cls.unpack_batch_item(response)
+
+    @staticmethod
+    def unpack_batch_item(item):
+        # Элемент пакетного ответа приводится к тому же виду, что и ответ на одиночный запрос
+        if isinstance(item, str):
+            try:
+                return json.loads(item)
+            except json.JSONDecodeError:
+                return {"text_response": item.strip()}
+        return item
+
+    def request(self, data, usage=None):
+        try:
+            response = self.post(data)
+            for counter in (self.usage, usage):
+                if counter is not None:
+                    counter.record(data["prompt"], response.text)
+
+            # Попытка парсинга как JSON
+            try:
+                json_response = response.json()
+                print("Ответ от LLM API (JSON):", json_response)
+                return json_response  # Возвращаем JSON-ответ, если парсинг успешен
+            except json.JSONDecodeError:
+                # Обработка текстового ответа
+                raw_text_response = response.text.strip()
+                print("Ответ от LLM API (текст):", raw_text_response)
+                return {"text_response": raw_text_response}  # Возвращаем текст в словаре
+
+        except requests.exceptions.RequestException as e:
+            print("Ошибка запроса к LLM:", str(e))
+            return {"error": f"Ошибка запроса к LLM: {str(e)}"}
+
+    def post(self, data):
+        body = json.dumps(data)
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            try:
+                response = self.session.post(self.url, data=body, timeout=self.timeout)
+            except requests.exceptions.ConnectionError as e:
+                # Таймаут чтения не повторяем: зависший запрос не должен ждать несколько раз
+                if last_attempt:
+                    raise
+                print(f"Ошибка соединения с LLM (попытка {attempt + 1}): {e}")
+            else:
+                if response.status_code < 500 or last_attempt:
+                    response.raise_for_status()
+                    return response
+                print(f"LLM API вернул {response.status_code} (попытка {attempt + 1})")
+            time.sleep(self.retry_delay(attempt))
+
+    def retry_delay(self, attempt):
+        # Full jitter: случайная задержка от 0 до экспоненциально растущей границы
+        return random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt))
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_llm_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = LLMClient()
+        return _client
@@ -0,0 +1,92 @@
+import json
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .digests import text_digest
+from .models import LLMResponseCache
+
+
+
+LLM_CACHE_ENABLED = getattr(settings, 'LLM_CACHE_ENABLED', True)
+LLM_CACHE_TTL = getattr(settings, 'LLM_CACHE_TTL', 7 * 24 * 3600)  # Время жизни записи, сек
+LLM_CACHE_MAX_ENTRIES = getattr(settings, 'LLM_CACHE_MAX_ENTRIES', 5000)  # Записей в кеше, лишние вытесняются по давности использования
+LLM_CACHE_PRUNE_EVERY = getattr(settings, 'LLM_CACHE_PRUNE_EVERY', 100)  # Очистка кеша после каждых N записей
+
+
+def cache_key(url, data):
+    # Промт и параметры генерации (max_tokens, temperature, system_prompt и т.д.) входят в ключ
+    return text_digest(json.dumps({"url": url, **data}, sort_keys=True, ensure_ascii=False))
+
+
+class LLMResponseCacheStore:
+    # Персистентный кеш ответов LLM в БД с вытеснением по TTL и размеру и счетчиками попаданий
+
+    def __init__(self, ttl=LLM_CACHE_TTL, max_entries=LLM_CACHE_MAX_ENTRIES, prune_every=LLM_CACHE_PRUNE_EVERY):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.prune_every = prune_every
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = timezone.now()
+        entry = LLMResponseCache.objects.filter(key=key, created_at__gte=now - timedelta(seconds=self.ttl)).first()
+        if entry is None:
+            self._count(hit=False)
+            return None
+
+        LLMResponseCache.objects.filter(key=key).update(hits=F('hits') + 1, last_used_at=now)
+        self._count(hit=True)
+        return entry.response
+
+    def set(self, key, response):
+        now = timezone.now()
+        # Один INSERT ... ON CONFLICT DO UPDATE, без чтения перед записью
+        LLMResponseCache.objects.bulk_create(
+            [LLMResponseCache(key=key, response=response, created_at=now, last_used_at=now)],
+            update_conflicts=True,
+            unique_fields=['key'],
+            update_fields=['response', 'created_at', 'last_used_at', 'hits'],
+        )
+        with self._lock:
+            self._writes += 1
+            should_prune = self._writes % self.prune_every == 0
+        if should_prune:
+            self.prune()
+
+    def prune(self):
+        expired, _ = LLMResponseCache.objects.filter(created_at__lt=timezone.now() - timedelta(seconds=self.ttl)).delete()
+        overflow = LLMResponseCache.objects.count() - self.max_entries
+        evicted = 0
+        if overflow > 0:
+            keys = list(LLMResponseCache.objects.order_by('last_used_at').values_list('key', flat=True)[:overflow])
+            evicted, _ = LLMResponseCache.objects.filter(key__in=keys).delete()
+        return expired + evicted
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / lookups if lookups else None,
+            "entries": LLMResponseCache.objects.count(),
+            "stored_hits": LLMResponseCache.objects.aggregate(total=Sum('hits'))['total'] or 0,
+        }
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+
+llm_response_cache = LLMResponseCacheStore()
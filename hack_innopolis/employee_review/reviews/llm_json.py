@@ -0,0 +1,209 @@
+import ast
+import json
+import math
+import re
+import threading
+
+
+
+CLEAN = 'clean'
+REPAIRED = 'repaired'
+FAILED = 'failed'
+
+FENCE_RE = re.compile(r'```(?:json|JSON)?\s*(.*?)```', re.DOTALL)
+TRAILING_COMMA_RE = re.compile(r',(\s*[}\]])')
+SCORE_RE = re.compile(r'-?\d+(?:[.,]\d+)?')
+SMART_QUOTES = str.maketrans({'“': '"', '”': '"', '„': '"', '«': '"', '»': '"'})
+PYTHON_LITERALS = [(re.compile(r'\bTrue\b'), 'true'), (re.compile(r'\bFalse\b'), 'false'), (re.compile(r'\bNone\b'), 'null')]
+
+
+class LLMJSONError(ValueError):
+    pass
+
+
+class ParseStats:
+    # Счетчики разбора ответов LLM по видам ответа: чистый JSON, исправленный, не разобран
+
+    def __init__(self):
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, kind, outcome):
+        with self._lock:
+            counts = self.counts.setdefault(kind, {CLEAN: 0, REPAIRED: 0, FAILED: 0})
+            counts[outcome] += 1
+
+    def as_dict(self):
+        with self._lock:
+            stats = {kind: dict(counts) for kind, counts in self.counts.items()}
+        for counts in stats.values():
+            total = sum(counts.values())
+            counts["failure_rate"] = round(counts[FAILED] / total, 4) if total else 0.0
+        return stats
+
+
+parse_stats = ParseStats()
+
+
+def balanced_object(text, start):
+    # Подстрока от открывающей скобки до парной закрывающей с учетом строк.
+    # Если текст оборвался, недостающие скобки дописываются
+    stack = []
+    in_string = False
+    escaped = False
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in '{[':
+            stack.append('}' if char == '{' else ']')
+        elif char in '}]':
+            if not stack or stack.pop() != char:
+                return None
+            if not stack:
+                return text[start:index + 1]
+    if in_string:
+        return None
+    return text[start:] + ''.join(reversed(stack))
+
+
+def repair(candidate):
+    candidate = candidate.translate(SMART_QUOTES)
+    candidate = TRAILING_COMMA_RE.sub(r'\1', candidate)
+    for pattern, replacement in PYTHON_LITERALS:
+        candidate = pattern.sub(replacement, candidate)
+    return candidate
+
+
+def json_candidates(text):
+    # Все JSON-объекты и массивы в тексте по порядку: ответ может быть обернут в пояснения
+    # или ```json```, содержать висячие запятые или оборваться. Пары (данные, исправлялся ли текст)
+    text = text.strip()
+    try:
+        yield json.loads(text), False
+    except json.JSONDecodeError:
+        pass
+
+    sources = [match.group(1) for match in FENCE_RE.finditer(text)] + [text]
+    for source in sources:
+        for match in re.finditer(r'[{\[]', source):
+            candidate = balanced_object(source, match.start())
+            if candidate is None:
+                continue
+            parsed = False
+            for attempt in (candidate, repair(candidate)):
+                try:
+                    yield json.loads(attempt), True
+                    parsed = True
+                    break
+                except json.JSONDecodeError:
+                    continue
+            if parsed:
+                continue
+            # Словарь в синтаксисе Python (одинарные кавычки)
+            try:
+                data = ast.literal_eval(candidate)
+            except (ValueError, SyntaxError, MemoryError, RecursionError):
+                continue
+            if isinstance(data, (dict, list)):
+                yield data, True
+
+
+def extract_json(text, validate=None):
+    # Первый фрагмент JSON, который проходит проверку validate (без нее — первый разобранный).
+    # Пояснение вроде "оценки в диапазоне [1, 5]" перед ответом пропускается, а не отклоняет ответ.
+    # Возвращает (данные, исправлялся ли текст)
+    error = None
+    for data, repaired in json_candidates(text):
+        if validate is None:
+            return data, repaired
+        try:
+            return validate(data), repaired
+        except LLMJSONError as e:
+            error = error or e
+    raise error or LLMJSONError("JSON в ответе LLM не найден.")
+
+
+def response_json(evaluation, validate=None):
+    # Ответ клиента LLM ({"text_response": ...}, уже разобранный JSON или строка) в виде проверенных данных
+    if isinstance(evaluation, dict) and "text_response" in evaluation:
+        return extract_json(evaluation["text_response"], validate)
+    if isinstance(evaluation, str):
+        return extract_json(evaluation, validate)
+    if isinstance(evaluation, dict) and "error" in evaluation:
+        raise LLMJSONError(evaluation["error"])
+    return (validate(evaluation) if validate else evaluation), False
+
+
+def to_score(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value) if math.isfinite(value) else None
+    if isinstance(value, str):
+        # "4.5", "4,5", "4/5", "Оценка: 4"
+        match = SCORE_RE.search(value)
+        return float(match.group().replace(',', '.')) if match else None
+    return None
+
+
+def validate_summary(data, require_score=True):
+    # Схема сводки: аспект -> {"score": число, "description": строка}.
+    # Некорректные аспекты отбрасываются, пустой результат — ошибка
+    if isinstance(data, list) and len(data) == 1:
+        data = data[0]
+    if not isinstance(data, dict):
+        raise LLMJSONError("Ожидался JSON-объект с аспектами.")
+    if len(data) == 1:
+        (inner,) = data.values()
+        if isinstance(inner, dict) and inner and all(isinstance(value, dict) for value in inner.values()):
+            data = inner  # {"aspects": {...}} и подобные обертки
+
+    summary = {}
+    for aspect_name, value in data.items():
+        if not isinstance(value, dict):
+            continue
+        score = to_score(value.get("score"))
+        if require_score and score is None:
+            continue
+        description = value.get("description", "")
+        entry = {"description": description if isinstance(description, str) else json.dumps(description, ensure_ascii=False)}
+        if score is not None:
+            entry["score"] = score
+        summary[str(aspect_name)] = entry
+    if not summary:
+        raise LLMJSONError("В ответе нет аспектов с оценкой и описанием.")
+    return summary
+
+
+def validate_psychotype(data):
+    if not isinstance(data, dict) or not isinstance(data.get("psychotype"), str) or not data["psychotype"].strip():
+        raise LLMJSONError("В ответе нет психотипа.")
+    description = data.get("psychotype_description")
+    return {
+        "psychotype": data["psychotype"].strip(),
+        "psychotype_description": description.strip() if isinstance(description, str) else "",
+    }
+
+
+def parse_llm_json(evaluation, validate, kind=None):
+    # Разбор и проверка ответа LLM. kind — вид ответа для статистики (None — не учитывать).
+    # Бросает LLMJSONError
+    try:
+        result, repaired = response_json(evaluation, validate)
+    except LLMJSONError as e:
+        if kind:
+            parse_stats.record(kind, FAILED)
+            print(f"Не удалось разобрать ответ LLM ({kind}): {e}")
+        raise
+    if kind:
+        parse_stats.record(kind, REPAIRED if repaired else CLEAN)
+    return result
@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Length
+from reviews.models import Employee, Feedback, FeedbackLengthStats
+
+
+
+class Command(BaseCommand):
+    help = "Проверяет и пересобирает накопленную статистику длин отзывов по сотрудникам"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help="Только проверить согласованность, ничего не изменяя")
+        parser.add_argument('--lengths', action='store_true', help="Пересчитать длины текстов отзывов перед сборкой статистики")
+        parser.add_argument('--employee', type=int, action='append', dest='employee_ids', help="ID сотрудника (можно указать несколько раз)")
+
+    def handle(self, *args, check=False, lengths=False, employee_ids=None, **options):
+        feedbacks = Feedback.objects.all()
+        if employee_ids:
+            feedbacks = feedbacks.filter(employee_id__in=employee_ids)
+
+        if check:
+            wrong_lengths = feedbacks.annotate(actual=Length('text')).exclude(text_length=F('actual')).count()
+            if wrong_lengths:
+                self.stdout.write(self.style.WARNING(f"Отзывов с неверной длиной текста: {wrong_lengths}"))
+        elif lengths:
+            feedbacks.update(text_length=Length('text'))
+
+        expected = FeedbackLengthStats.aggregate_from_feedback(employee_ids)
+        stored = FeedbackLengthStats.objects.all()
+        if employee_ids:
+            stored = stored.filter(employee_id__in=employee_ids)
+        stored = {stats.employee_id: stats for stats in stored}
+
+        mismatched = [
+            employee_id
+            for employee_id in set(expected) | set(stored)
+            if not self.is_consistent(expected.get(employee_id), stored.get(employee_id))
+        ]
+
+        if check:
+            if mismatched:
+                self.stdout.write(self.style.WARNING(
+                    f"Несогласованная статистика у {len(mismatched)} сотрудников: {sorted(mismatched)[:20]}"
+                ))
+            else:
+                self.stdout.write(self.style.SUCCESS("Статистика длин отзывов согласована."))
+            return
+
+        with transaction.atomic():
+            existing_employees = set(Employee.objects.filter(id__in=mismatched).values_list('id', flat=True))
+            FeedbackLengthStats.objects.filter(employee_id__in=mismatched).delete()
+            FeedbackLengthStats.objects.bulk_create(
+                [expected[employee_id] for employee_id in mismatched
+                 if employee_id in expected and employee_id in existing_employees],
+                batch_size=500,
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Статистика пересобрана для {len(mismatched)} сотрудников."))
+
+    @staticmethod
+    def is_consistent(expected, stored, tolerance=1e-6):
+        if expected is None or stored is None:
+            # Пустая статистика равнозначна отсутствующей
+            present = expected or stored
+            return present.count == 0
+        if expected.count != stored.count or expected.max_length != stored.max_length:
+            return False
+        return (
+            abs(expected.mean - stored.mean) <= tolerance * max(1.0, abs(expected.mean))
+            and abs(expected.m2 - stored.m2) <= tolerance * max(1.0, expected.count * expected.mean ** 2)
+        )
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from reviews.recompute import EMPLOYEE_CHUNK_SIZE, recompute_feedback_weights
+
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает веса всех отзывов по актуальному набору отзывов каждого сотрудника"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--changed-only', action='store_true', help="Только сотрудники, чьи отзывы менялись с прошлого пересчета")
+        parser.add_argument('--chunk-size', type=int, default=EMPLOYEE_CHUNK_SIZE, help="Сотрудников за один проход")
+
+    def handle(self, *args, changed_only, chunk_size, **options):
+        run = recompute_feedback_weights(changed_only=changed_only, chunk_size=chunk_size, log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(
+            f"Сотрудников: {run.employees}, отзывов: {run.feedbacks}, обновлено весов: {run.updated}"
+        ))
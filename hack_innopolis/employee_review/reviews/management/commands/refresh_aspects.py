@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from reviews.aspects import catalog_version, outdated_summaries, stale_aspects
+from reviews.models import Aspect
+from reviews.summary import SummaryError, SummaryGenerator
+
+
+
+class Command(BaseCommand):
+    help = "Переоценивает в последних сводках только аспекты, добавленные или измененные после их построения"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employee', type=int, action='append', help="Только указанные сотрудники")
+        parser.add_argument('--dry-run', action='store_true', help="Только показать устаревшие аспекты")
+
+    def handle(self, *args, employee, dry_run, **options):
+        summaries = outdated_summaries()
+        if employee:
+            summaries = summaries.filter(employee_id__in=employee)
+
+        aspects = list(Aspect.objects.all())
+        self.stdout.write(f"Версия каталога аспектов: {catalog_version()}")
+        refreshed = failed = 0
+        for general_summary in summaries:
+            stale = stale_aspects(general_summary, aspects)
+            names = ', '.join(aspect.text for aspect in stale) or "нет"
+            self.stdout.write(f"Сотрудник {general_summary.employee_id}: устаревшие аспекты — {names}")
+            if dry_run:
+                continue
+            try:
+                SummaryGenerator().refresh_aspects(general_summary.employee, aspects=stale)
+                refreshed += 1
+            except SummaryError as e:
+                failed += 1
+                self.stderr.write(f"Сотрудник {general_summary.employee_id}: {e.detail}")
+
+        if not dry_run:
+            self.stdout.write(self.style.SUCCESS(f"Обновлено сводок: {refreshed}, ошибок: {failed}"))
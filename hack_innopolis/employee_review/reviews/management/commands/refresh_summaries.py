@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from reviews.scheduler import (
+    SUMMARY_REFRESH_MAX_CALLS, SUMMARY_REFRESH_MAX_TOKENS, SUMMARY_REFRESH_WORKERS,
+    SummaryRefreshScheduler, stale_employees,
+)
+
+
+
+class Command(BaseCommand):
+    help = "Обновляет сводки сотрудников в порядке устаревания с ограничением бюджета LLM"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=SUMMARY_REFRESH_WORKERS, help="Сотрудников, обрабатываемых одновременно")
+        parser.add_argument('--max-calls', type=int, default=SUMMARY_REFRESH_MAX_CALLS, help="Бюджет запросов к LLM на запуск")
+        parser.add_argument('--max-tokens', type=int, default=SUMMARY_REFRESH_MAX_TOKENS, help="Бюджет токенов (оценка) на запуск")
+        parser.add_argument('--limit', type=int, help="Не больше N самых устаревших сотрудников")
+        parser.add_argument('--full', action='store_true', help="Полная пересборка сводок вместо инкрементальной")
+        parser.add_argument('--resume', action='store_true', help="Продолжить последний незавершенный запуск")
+        parser.add_argument('--dry-run', action='store_true', help="Только показать очередь сотрудников")
+
+    def handle(self, *args, workers, max_calls, max_tokens, limit, full, resume, dry_run, **options):
+        if dry_run:
+            for row in stale_employees(limit=limit):
+                self.stdout.write(f"Сотрудник {row['employee_id']}: новых отзывов {row['new_count']}, вес {row['new_weight']:.2f}")
+            return
+
+        kwargs = {"workers": workers, "full": full, "log": self.stdout.write}
+        if resume:
+            scheduler = SummaryRefreshScheduler.resume(**kwargs)
+            if scheduler is None:
+                self.stdout.write("Незавершенных запусков нет.")
+                return
+            # Бюджет можно увеличить при продолжении
+            scheduler.run.max_calls = max_calls if max_calls is not None else scheduler.run.max_calls
+            scheduler.run.max_tokens = max_tokens if max_tokens is not None else scheduler.run.max_tokens
+        else:
+            scheduler = SummaryRefreshScheduler.start(max_calls=max_calls, max_tokens=max_tokens, limit=limit, **kwargs)
+
+        scheduler.execute()
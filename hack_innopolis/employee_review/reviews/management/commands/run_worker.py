@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from reviews.jobs import JOB_POLL_INTERVAL, JOB_WORKER_CONCURRENCY, Worker
+
+
+
+class Command(BaseCommand):
+    help = "Запускает локальный обработчик фоновых задач (загрузка отзывов, генерация сводок)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=JOB_WORKER_CONCURRENCY, help="Число задач, выполняемых одновременно")
+        parser.add_argument('--poll-interval', type=float, default=JOB_POLL_INTERVAL, help="Пауза между опросами пустой очереди, сек")
+        parser.add_argument('--once', action='store_true', help="Обработать текущую очередь и завершиться")
+
+    def handle(self, *args, concurrency, poll_interval, once, **options):
+        worker = Worker(concurrency=concurrency, poll_interval=poll_interval, log=self.stdout.write)
+        self.stdout.write(f"Обработчик {worker.name} запущен, параллельных задач: {worker.concurrency}")
+        try:
+            worker.run(once=once)
+        except KeyboardInterrupt:
+            worker.stop()
+            self.stdout.write("Обработчик остановлен.")
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0012_employee_psychotype_description_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedbackLengthStats',
+            fields=[
+                ('employee', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='length_stats', serialize=False, to='reviews.employee', verbose_name='Сотрудник')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Количество отзывов')),
+                ('mean', models.FloatField(default=0.0, verbose_name='Средняя длина')),
+                ('m2', models.FloatField(default=0.0, verbose_name='Сумма квадратов отклонений')),
+                ('max_length', models.PositiveIntegerField(default=0, verbose_name='Максимальная длина')),
+                ('updated_at', models.DateTimeField(auto_now=True, null=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Статистика длин отзывов',
+                'verbose_name_plural': 'Статистика длин отзывов',
+            },
+        ),
+        migrations.AddField(
+            model_name='feedback',
+            name='text_length',
+            field=models.PositiveIntegerField(default=0, verbose_name='Длина текста'),
+        ),
+    ]
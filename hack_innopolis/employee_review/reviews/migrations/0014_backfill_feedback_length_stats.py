@@ -0,0 +1,43 @@
+from django.db import migrations
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import Length
+
+
+def backfill_length_stats(apps, schema_editor):
+    Feedback = apps.get_model('reviews', 'Feedback')
+    FeedbackLengthStats = apps.get_model('reviews', 'FeedbackLengthStats')
+
+    # Длины текстов считаются на стороне БД одним запросом
+    Feedback.objects.update(text_length=Length('text'))
+
+    rows = (
+        Feedback.objects.values('employee_id')
+        .annotate(
+            count=Count('id'),
+            total=Sum('text_length'),
+            total_sq=Sum(F('text_length') * F('text_length')),
+            max_length=Max('text_length'),
+        )
+    )
+    stats = []
+    for row in rows:
+        mean = row['total'] / row['count']
+        stats.append(FeedbackLengthStats(
+            employee_id=row['employee_id'],
+            count=row['count'],
+            mean=mean,
+            m2=max(row['total_sq'] - row['count'] * mean ** 2, 0.0),
+            max_length=row['max_length'],
+        ))
+    FeedbackLengthStats.objects.bulk_create(stats, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0013_feedback_text_length_feedbacklengthstats'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_length_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0014_backfill_feedback_length_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SentimentScore',
+            fields=[
+                ('digest', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='Хеш текста')),
+                ('polarity', models.FloatField(verbose_name='Полярность')),
+                ('created_at', models.DateTimeField(auto_now_add=True, null=True, verbose_name='Дата создания')),
+            ],
+            options={
+                'verbose_name': 'Оценка тональности',
+                'verbose_name_plural': 'Оценки тональности',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0015_sentimentscore'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feedback',
+            name='digest',
+            field=models.CharField(default='', editable=False, max_length=64, verbose_name='Хеш текста'),
+        ),
+    ]
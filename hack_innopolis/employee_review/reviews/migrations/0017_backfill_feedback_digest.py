@@ -0,0 +1,76 @@
+import hashlib
+
+from django.db import migrations
+from django.db.models import Count, F, Max, Sum
+
+
+BATCH_SIZE = 500
+
+
+def backfill_feedback_digest(apps, schema_editor):
+    Feedback = apps.get_model('reviews', 'Feedback')
+    FeedbackLengthStats = apps.get_model('reviews', 'FeedbackLengthStats')
+
+    # Хеши считаются пачками, тексты в память целиком не загружаются
+    last_id = 0
+    while True:
+        batch = list(Feedback.objects.filter(id__gt=last_id).order_by('id').only('id', 'text')[:BATCH_SIZE])
+        if not batch:
+            break
+        for feedback in batch:
+            feedback.digest = hashlib.sha256(feedback.text.encode('utf-8')).hexdigest()
+        Feedback.objects.bulk_update(batch, ['digest'])
+        last_id = batch[-1].id
+
+    # Перед добавлением уникального индекса удаляем повторы, оставляя самый ранний отзыв
+    seen = set()
+    duplicate_ids = []
+    affected_employees = set()
+    rows = Feedback.objects.order_by('id').values_list('id', 'employee_id', 'review_creator_id', 'digest')
+    for feedback_id, employee_id, reviewer_id, digest in rows.iterator():
+        key = (employee_id, reviewer_id, digest)
+        if key in seen:
+            duplicate_ids.append(feedback_id)
+            affected_employees.add(employee_id)
+        else:
+            seen.add(key)
+
+    if not duplicate_ids:
+        return
+
+    for start in range(0, len(duplicate_ids), BATCH_SIZE):
+        Feedback.objects.filter(id__in=duplicate_ids[start:start + BATCH_SIZE]).delete()
+
+    # Пересобираем статистику длин для затронутых сотрудников
+    affected_employees = list(affected_employees)
+    for start in range(0, len(affected_employees), BATCH_SIZE):
+        chunk = affected_employees[start:start + BATCH_SIZE]
+        stats = (
+            Feedback.objects.filter(employee_id__in=chunk)
+            .values('employee_id')
+            .annotate(
+                rows_count=Count('id'),
+                total=Sum('text_length'),
+                total_sq=Sum(F('text_length') * F('text_length')),
+                longest=Max('text_length'),
+            )
+        )
+        for row in stats:
+            mean = row['total'] / row['rows_count']
+            FeedbackLengthStats.objects.filter(employee_id=row['employee_id']).update(
+                count=row['rows_count'],
+                mean=mean,
+                m2=max(row['total_sq'] - row['rows_count'] * mean ** 2, 0.0),
+                max_length=row['longest'],
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0016_feedback_digest'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_feedback_digest, migrations.RunPython.noop),
+    ]
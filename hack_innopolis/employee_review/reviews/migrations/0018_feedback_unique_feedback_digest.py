@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0017_backfill_feedback_digest'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='feedback',
+            constraint=models.UniqueConstraint(fields=('employee', 'review_creator', 'digest'), name='unique_feedback_digest'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0019_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeightRecomputeRun',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('started_at', models.DateTimeField(verbose_name='Дата запуска')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата завершения')),
+                ('changed_only', models.BooleanField(default=False, verbose_name='Только изменившиеся')),
+                ('employees', models.PositiveIntegerField(default=0, verbose_name='Сотрудников')),
+                ('feedbacks', models.PositiveIntegerField(default=0, verbose_name='Отзывов')),
+                ('updated', models.PositiveIntegerField(default=0, verbose_name='Обновлено весов')),
+            ],
+            options={
+                'verbose_name': 'Пересчет весов',
+                'verbose_name_plural': 'Пересчеты весов',
+            },
+        ),
+    ]
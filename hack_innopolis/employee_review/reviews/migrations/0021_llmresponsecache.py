@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0020_weightrecomputerun'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMResponseCache',
+            fields=[
+                ('key', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='Ключ')),
+                ('response', models.JSONField(verbose_name='Ответ')),
+                ('hits', models.PositiveIntegerField(default=0, verbose_name='Попаданий')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('last_used_at', models.DateTimeField(auto_now_add=True, verbose_name='Последнее использование')),
+            ],
+            options={
+                'verbose_name': 'Ответ LLM в кеше',
+                'verbose_name_plural': 'Кеш ответов LLM',
+                'indexes': [models.Index(fields=['last_used_at'], name='llm_cache_last_used_idx'), models.Index(fields=['created_at'], name='llm_cache_created_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0021_llmresponsecache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aspectsummary',
+            name='general_summary',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='aspect_summaries', to='reviews.generalsummary', verbose_name='Общий вывод'),
+        ),
+        migrations.AddField(
+            model_name='generalsummary',
+            name='feedback',
+            field=models.ManyToManyField(blank=True, related_name='general_summaries', to='reviews.feedback', verbose_name='Учтенные отзывы'),
+        ),
+        migrations.AddField(
+            model_name='generalsummary',
+            name='reviews_weight',
+            field=models.FloatField(default=0.0, verbose_name='Суммарный вес учтенных отзывов'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0022_summary_covered_feedback'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SummaryRefreshRun',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('running', 'Выполняется'), ('finished', 'Завершен'), ('budget', 'Исчерпан бюджет')], default='running', max_length=10, verbose_name='Статус')),
+                ('queue', models.JSONField(default=list, verbose_name='Очередь сотрудников')),
+                ('done', models.JSONField(default=list, verbose_name='Обработанные сотрудники')),
+                ('failed', models.JSONField(default=dict, verbose_name='Ошибки по сотрудникам')),
+                ('max_calls', models.PositiveIntegerField(blank=True, null=True, verbose_name='Бюджет запросов к LLM')),
+                ('max_tokens', models.PositiveIntegerField(blank=True, null=True, verbose_name='Бюджет токенов')),
+                ('llm_calls', models.PositiveIntegerField(default=0, verbose_name='Запросов к LLM')),
+                ('llm_tokens', models.PositiveIntegerField(default=0, verbose_name='Токенов (оценка)')),
+                ('elapsed', models.FloatField(default=0.0, verbose_name='Время работы, сек')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Плановое обновление сводок',
+                'verbose_name_plural': 'Плановые обновления сводок',
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0023_summaryrefreshrun'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SummaryLease',
+            fields=[
+                ('employee', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary_lease', serialize=False, to='reviews.employee', verbose_name='Сотрудник')),
+                ('owner', models.CharField(max_length=100, verbose_name='Владелец')),
+                ('status', models.CharField(choices=[('running', 'Выполняется'), ('done', 'Выполнена'), ('failed', 'Ошибка')], default='running', max_length=10, verbose_name='Статус')),
+                ('expires_at', models.DateTimeField(verbose_name='Действует до')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='Результат')),
+                ('error', models.TextField(blank=True, null=True, verbose_name='Ошибка')),
+                ('error_status', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='HTTP-статус ошибки')),
+                ('coalesced', models.PositiveIntegerField(default=0, verbose_name='Присоединившихся запросов')),
+                ('started_at', models.DateTimeField(verbose_name='Дата запуска')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата завершения')),
+            ],
+            options={
+                'verbose_name': 'Генерация сводки',
+                'verbose_name_plural': 'Генерации сводок',
+            },
+        ),
+    ]
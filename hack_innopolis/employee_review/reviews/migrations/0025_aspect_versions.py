@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0024_summarylease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aspect',
+            name='version',
+            field=models.PositiveIntegerField(default=1, verbose_name='Версия'),
+        ),
+        migrations.AddField(
+            model_name='aspectsummary',
+            name='aspect',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='summaries', to='reviews.aspect', verbose_name='Аспект'),
+        ),
+        migrations.AddField(
+            model_name='aspectsummary',
+            name='aspect_version',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Версия аспекта'),
+        ),
+        migrations.AddField(
+            model_name='generalsummary',
+            name='aspect_catalog_version',
+            field=models.PositiveIntegerField(default=0, verbose_name='Версия каталога аспектов'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+import re
+
+from django.db import migrations
+
+
+BATCH_SIZE = 500
+
+
+def aspect_key(name):
+    name = re.sub(r'^\s*\d+[.)]\s*', '', str(name))
+    return re.sub(r'\s+', ' ', name).strip(' "«»:.').lower()
+
+
+def link_aspect_summaries(apps, schema_editor):
+    # Существующие выводы по аспектам связываются с аспектами по названию (версия каталога 1)
+    Aspect = apps.get_model('reviews', 'Aspect')
+    AspectSummary = apps.get_model('reviews', 'AspectSummary')
+
+    aspects = {aspect_key(text): aspect_id for aspect_id, text in Aspect.objects.values_list('id', 'text')}
+    last_id = 0
+    while True:
+        batch = list(AspectSummary.objects.filter(id__gt=last_id).order_by('id').only('id', 'aspect_name')[:BATCH_SIZE])
+        if not batch:
+            break
+        linked = []
+        for aspect_summary in batch:
+            aspect_id = aspects.get(aspect_key(aspect_summary.aspect_name))
+            if aspect_id is not None:
+                aspect_summary.aspect_id = aspect_id
+                aspect_summary.aspect_version = 1
+                linked.append(aspect_summary)
+        AspectSummary.objects.bulk_update(linked, ['aspect', 'aspect_version'])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0025_aspect_versions'),
+    ]
+
+    operations = [
+        migrations.RunPython(link_aspect_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0026_link_aspect_summaries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmployeeDataVersion',
+            fields=[
+                ('employee', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='data_version', serialize=False, to='reviews.employee', verbose_name='Сотрудник')),
+                ('version', models.PositiveBigIntegerField(default=0, verbose_name='Версия')),
+                ('updated_at', models.DateTimeField(verbose_name='Дата изменения')),
+            ],
+            options={
+                'verbose_name': 'Версия данных сотрудника',
+                'verbose_name_plural': 'Версии данных сотрудников',
+            },
+        ),
+    ]
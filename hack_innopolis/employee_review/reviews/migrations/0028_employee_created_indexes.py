@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0027_employeedataversion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='aspectsummary',
+            index=models.Index(fields=['employee', 'created_at'], name='asummary_emp_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(fields=['employee', 'created_at'], name='feedback_emp_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='generalsummary',
+            index=models.Index(fields=['employee', 'created_at'], name='gsummary_emp_created_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Первичный ключ аренды меняется с сотрудника на (сотрудник, операция). Аренды — кратковременные
+    # записи о запусках, поэтому таблица пересоздается без переноса данных
+
+    dependencies = [
+        ('reviews', '0028_employee_created_indexes'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='SummaryLease',
+        ),
+        migrations.CreateModel(
+            name='SummaryLease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('generate', 'Генерация сводки'), ('refresh_aspects', 'Переоценка аспектов')], max_length=20, verbose_name='Операция')),
+                ('owner', models.CharField(max_length=100, verbose_name='Владелец')),
+                ('status', models.CharField(choices=[('running', 'Выполняется'), ('done', 'Выполнена'), ('failed', 'Ошибка')], default='running', max_length=10, verbose_name='Статус')),
+                ('expires_at', models.DateTimeField(verbose_name='Действует до')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='Результат')),
+                ('error', models.TextField(blank=True, null=True, verbose_name='Ошибка')),
+                ('error_status', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='HTTP-статус ошибки')),
+                ('coalesced', models.PositiveIntegerField(default=0, verbose_name='Присоединившихся запросов')),
+                ('started_at', models.DateTimeField(verbose_name='Дата запуска')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата завершения')),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='summary_leases', to='reviews.employee', verbose_name='Сотрудник')),
+            ],
+            options={
+                'verbose_name': 'Операция над сводкой',
+                'verbose_name_plural': 'Операции над сводками',
+                'constraints': [models.UniqueConstraint(fields=('employee', 'kind'), name='unique_summary_lease_kind')],
+            },
+        ),
+    ]
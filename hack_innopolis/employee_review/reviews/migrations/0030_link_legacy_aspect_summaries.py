@@ -0,0 +1,44 @@
+from bisect import bisect_right
+
+from django.db import migrations
+
+
+BATCH_SIZE = 500
+
+
+def link_legacy_aspect_summaries(apps, schema_editor):
+    # Выводы по аспектам, сохраненные до появления запусков, привязываются к ближайшей
+    # более ранней общей сводке того же сотрудника: прежде общий вывод создавался первым,
+    # а выводы по аспектам — сразу после него
+    GeneralSummary = apps.get_model('reviews', 'GeneralSummary')
+    AspectSummary = apps.get_model('reviews', 'AspectSummary')
+
+    unlinked = AspectSummary.objects.filter(general_summary__isnull=True, created_at__isnull=False)
+    employee_ids = unlinked.values_list('employee_id', flat=True).distinct().order_by('employee_id')
+    for employee_id in list(employee_ids):
+        runs = list(
+            GeneralSummary.objects.filter(employee_id=employee_id, created_at__isnull=False)
+            .order_by('created_at', 'id').values_list('created_at', 'id')
+        )
+        if not runs:
+            continue
+        run_dates = [created_at for created_at, _ in runs]
+
+        linked = []
+        for aspect_summary in unlinked.filter(employee_id=employee_id).only('id', 'created_at').iterator(chunk_size=BATCH_SIZE):
+            position = bisect_right(run_dates, aspect_summary.created_at)
+            if position:
+                aspect_summary.general_summary_id = runs[position - 1][1]
+                linked.append(aspect_summary)
+        AspectSummary.objects.bulk_update(linked, ['general_summary'], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0029_summarylease_kind'),
+    ]
+
+    operations = [
+        migrations.RunPython(link_legacy_aspect_summaries, migrations.RunPython.noop),
+    ]
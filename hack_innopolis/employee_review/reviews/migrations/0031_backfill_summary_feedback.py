@@ -0,0 +1,52 @@
+from bisect import bisect_right
+
+from django.db import migrations
+
+
+BATCH_SIZE = 500
+
+
+def backfill_summary_feedback(apps, schema_editor):
+    # Сводки, созданные до появления списка учтенных отзывов, считаются построенными по всем
+    # отзывам сотрудника на момент создания. Иначе первый инкрементальный запуск после обновления
+    # принял бы все старые отзывы за новые и пересобрал сводку заново
+    GeneralSummary = apps.get_model('reviews', 'GeneralSummary')
+    Feedback = apps.get_model('reviews', 'Feedback')
+    Link = GeneralSummary.feedback.through
+
+    legacy = GeneralSummary.objects.filter(feedback__isnull=True, created_at__isnull=False)
+    employee_ids = legacy.values_list('employee_id', flat=True).distinct().order_by('employee_id')
+    for employee_id in list(employee_ids):
+        feedbacks = list(
+            Feedback.objects.filter(employee_id=employee_id, created_at__isnull=False)
+            .order_by('created_at', 'id').values_list('created_at', 'id', 'weight')
+        )
+        if not feedbacks:
+            continue
+        feedback_dates = [created_at for created_at, _, _ in feedbacks]
+
+        links = []
+        summaries = []
+        for summary in list(legacy.filter(employee_id=employee_id).only('id', 'created_at', 'reviews_weight')):
+            covered = feedbacks[:bisect_right(feedback_dates, summary.created_at)]
+            if not covered:
+                continue
+            links.extend(Link(generalsummary_id=summary.id, feedback_id=feedback_id) for _, feedback_id, _ in covered)
+            summary.reviews_weight = sum(weight for _, _, weight in covered)
+            summaries.append(summary)
+            if len(links) >= BATCH_SIZE:
+                Link.objects.bulk_create(links, batch_size=BATCH_SIZE, ignore_conflicts=True)
+                links = []
+        Link.objects.bulk_create(links, batch_size=BATCH_SIZE, ignore_conflicts=True)
+        GeneralSummary.objects.bulk_update(summaries, ['reviews_weight'], batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0030_link_legacy_aspect_summaries'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_summary_feedback, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:00
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def seed_catalog_version(apps, schema_editor):
+    # Счетчик продолжает прежнюю нумерацию: максимум версий аспектов и уже записанных в сводки
+    Aspect = apps.get_model('reviews', 'Aspect')
+    GeneralSummary = apps.get_model('reviews', 'GeneralSummary')
+    AspectCatalogVersion = apps.get_model('reviews', 'AspectCatalogVersion')
+    version = max(
+        Aspect.objects.aggregate(version=Max('version'))['version'] or 0,
+        GeneralSummary.objects.aggregate(version=Max('aspect_catalog_version'))['version'] or 0,
+    )
+    AspectCatalogVersion.objects.create(id=1, version=version)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0031_backfill_summary_feedback'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AspectCatalogVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(default=0, verbose_name='Версия')),
+            ],
+            options={
+                'verbose_name': 'Версия каталога аспектов',
+                'verbose_name_plural': 'Версия каталога аспектов',
+            },
+        ),
+        migrations.RunPython(seed_catalog_version, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,9 @@
-import numpy as np
-from textblob import TextBlob
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
+from django.db.models import Count, F, Max, Sum
 from django.core.exceptions import ValidationError
+from .digests import text_digest
+from .weights import emotion_weight, std_weight
 
 
 
@@ -19,9 +21,40 @@ class Employee(models.Model):
         return f"Сотрудник {self.id}"
 
 
+class AspectCatalogVersion(models.Model):
+    # Версия каталога аспектов — единственная строка со счетчиком, который только растет:
+    # увеличивается при добавлении, изменении и удалении аспекта. Максимум по живым аспектам
+    # для этого не годится — после удаления самого нового аспекта номер версии повторился бы
+    SINGLETON_ID = 1
+
+    version = models.PositiveIntegerField(default=0, verbose_name="Версия")
+
+    class Meta:
+        verbose_name = "Версия каталога аспектов"
+        verbose_name_plural = "Версия каталога аспектов"
+
+    def __str__(self):
+        return f"Версия каталога аспектов: {self.version}"
+
+    @classmethod
+    def current(cls):
+        return cls.objects.filter(pk=cls.SINGLETON_ID).values_list('version', flat=True).first() or 0
+
+    @classmethod
+    def bump(cls):
+        # Атомарное увеличение счетчика, возвращает новую версию
+        with transaction.atomic():
+            if not cls.objects.filter(pk=cls.SINGLETON_ID).update(version=F('version') + 1):
+                cls.objects.get_or_create(pk=cls.SINGLETON_ID)
+                cls.objects.filter(pk=cls.SINGLETON_ID).update(version=F('version') + 1)
+            return cls.current()
+
+
 class Aspect(models.Model):
     id = models.BigAutoField(primary_key=True)
     text = models.TextField(verbose_name="Текст аспекта")
+    # Версия каталога аспектов (AspectCatalogVersion), в которой аспект добавлен или изменен в последний раз
+    version = models.PositiveIntegerField(default=1, verbose_name="Версия")
 
     class Meta:
         verbose_name = "Аспект"
@@ -30,6 +63,16 @@ class Aspect(models.Model):
     def __str__(self):
         return self.text
 
+    def save(self, *args, **kwargs):
+        # Новый или переименованный аспект получает следующую версию каталога,
+        # по ней находятся сводки, где его нужно переоценить
+        changed = self.pk is None or not Aspect.objects.filter(pk=self.pk, text=self.text).exists()
+        if changed:
+            self.version = AspectCatalogVersion.bump()
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = set(kwargs['update_fields']) | {'version'}
+        super().save(*args, **kwargs)
+
 
 class ReviewCreator(models.Model):
     id = models.BigAutoField(primary_key=True)
@@ -51,15 +94,42 @@ class Feedback(models.Model):
     is_self_review = models.BooleanField(default=False, verbose_name="Самооценка") 
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания", null=True)
     weight = models.FloatField(verbose_name="Вес отзыва", default=0.0)
+    text_length = models.PositiveIntegerField(verbose_name="Длина текста", default=0)
+    digest = models.CharField(max_length=64, verbose_name="Хеш текста", default="", editable=False)
 
     class Meta:
         verbose_name = "Отзыв"
         verbose_name_plural = "Отзывы"
+        constraints = [
+            # Поиск дубликата — проба по индексу вместо сравнения полных текстов
+            models.UniqueConstraint(fields=['employee', 'review_creator', 'digest'], name='unique_feedback_digest'),
+        ]
+        indexes = [
+            models.Index(fields=['employee', 'created_at'], name='feedback_emp_created_idx'),
+        ]
 
     def save(self, *args, **kwargs):
+        with transaction.atomic():
+            self._save_with_weight(*args, **kwargs)
+
+    def _save_with_weight(self, *args, **kwargs):
+        # Запоминаем прежнюю длину, чтобы при редактировании поправить статистику
+        previous = None
+        if not self._state.adding:
+            previous = Feedback.objects.filter(pk=self.pk).values_list('employee_id', 'text_length').first()
+
         # Сначала сохраняем, чтобы получить ID
+        self.text_length = len(self.text)
+        self.digest = text_digest(self.text)
         super().save(*args, **kwargs)  
 
+        # Обновляем статистику длин отзывов сотрудника
+        if previous:
+            FeedbackLengthStats.remove_length(*previous)
+            if previous[0] != self.employee_id:
+                EmployeeDataVersion.changed([previous[0]])  # Отзыв перенесен к другому сотруднику
+        FeedbackLengthStats.add_lengths(self.employee_id, [self.text_length])
+
         # Метод оценивания на основе стандартных отклонений
         std_weight = self.calculate_std_weight()
 
@@ -90,37 +160,174 @@ class Feedback(models.Model):
         super().save(*args, **kwargs)
 
     def analyze_emotionality(self):
-        # Используем TextBlob для анализа эмоциональности
-        analysis = TextBlob(self.text)
+        from .sentiment import sentiment_scorer
 
-        # Получаем полярность (от -1 до 1)
-        polarity = analysis.sentiment.polarity
+        # Получаем полярность (от -1 до 1) через сервис оценки тональности с кешем
+        polarity = sentiment_scorer.score(self.text)
 
         # Корректируем вес в зависимости от полярности
         # Чем ближе к 0, тем больше вес
-        emotional_weight = 1 - abs(polarity)
-
-        return emotional_weight
+        return emotion_weight(polarity)
 
     def calculate_std_weight(self):
-        # Получаем все отзывы для данного сотрудника
-        feedbacks = Feedback.objects.filter(employee=self.employee)
-        
-        if feedbacks.count() < 2:
+        # Вес считается по накопленной статистике длин отзывов сотрудника, без чтения текстов
+        stats = FeedbackLengthStats.objects.filter(employee_id=self.employee_id).first()
+        if stats is None:
             return 1.0  # Если отзывов недостаточно, возвращаем максимальный вес
+        return stats.std_weight()
 
-        # Предположим, что вес каждого отзыва - это его длина (можно использовать другую метрику)
-        weights = [len(fb.text) for fb in feedbacks]
-        
-        # Вычисляем стандартное отклонение
-        std_dev = np.std(weights)
+    def __str__(self):
+        return f"Отзыв от {self.review_creator.id} к {self.employee.id} с весом {self.weight}"
 
-        # Преобразуем стандартное отклонение в вес
-        weight = 1 - std_dev / max(weights)  # Нормализуем на максимальную длину
-        return max(0, min(weight, 1))
+
+class SentimentScore(models.Model):
+    # Персистентный кеш тональности текстов, ключ — хеш содержимого
+    digest = models.CharField(max_length=64, primary_key=True, verbose_name="Хеш текста")
+    polarity = models.FloatField(verbose_name="Полярность")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания", null=True)
+
+    class Meta:
+        verbose_name = "Оценка тональности"
+        verbose_name_plural = "Оценки тональности"
 
     def __str__(self):
-        return f"Отзыв от {self.review_creator.id} к {self.employee.id} с весом {self.weight}"
+        return f"Тональность {self.digest[:12]}: {self.polarity}"
+
+
+class EmployeeDataVersion(models.Model):
+    # Счетчик изменений данных сотрудника (отзывы, сводки, психотип) для ETag и Last-Modified.
+    # Хранится отдельно от Employee, чтобы employee.save() не перезаписывал его устаревшим значением
+    employee = models.OneToOneField(Employee, on_delete=models.CASCADE, primary_key=True, related_name="data_version", verbose_name="Сотрудник")
+    version = models.PositiveBigIntegerField(default=0, verbose_name="Версия")
+    updated_at = models.DateTimeField(verbose_name="Дата изменения")
+
+    class Meta:
+        verbose_name = "Версия данных сотрудника"
+        verbose_name_plural = "Версии данных сотрудников"
+
+    def __str__(self):
+        return f"Версия данных сотрудника {self.employee_id}: {self.version}"
+
+    @classmethod
+    def changed(cls, employee_ids, create=True):
+        # Вызывается при каждой записи данных сотрудника, в той же транзакции: из сигналов
+        # (reviews/signals.py) и явно после bulk-операций, которые сигналов не отправляют.
+        # Версия входит в ключи кеша ответов, поэтому отдельный сброс кеша не нужен.
+        # create=False — только увеличить существующие версии: при удалении сотрудника каскадом
+        # новая запись ссылалась бы на удаляемую строку и нарушала внешний ключ
+        employee_ids = {int(employee_id) for employee_id in employee_ids}
+        if not employee_ids:
+            return
+        now = timezone.now()
+        existing = set()
+        ids = sorted(employee_ids)
+        for start in range(0, len(ids), 500):  # Ограничение на число параметров в IN (...) для SQLite
+            chunk = ids[start:start + 500]
+            cls.objects.filter(employee_id__in=chunk).update(version=F('version') + 1, updated_at=now)
+            existing.update(cls.objects.filter(employee_id__in=chunk).values_list('employee_id', flat=True))
+        if not create:
+            return
+        cls.objects.bulk_create(
+            [cls(employee_id=employee_id, version=1, updated_at=now) for employee_id in employee_ids - existing],
+            ignore_conflicts=True
+        )
+
+    @classmethod
+    def current(cls, employee_id):
+        # (версия, дата изменения) одним чтением по первичному ключу; у сотрудника без записей версия 0
+        row = cls.objects.filter(employee_id=employee_id).values_list('version', 'updated_at').first()
+        return row or (0, None)
+
+
+class FeedbackLengthStats(models.Model):
+    # Накопленная статистика длин отзывов сотрудника (алгоритм Уэлфорда)
+    employee = models.OneToOneField(Employee, on_delete=models.CASCADE, primary_key=True, related_name="length_stats", verbose_name="Сотрудник")
+    count = models.PositiveIntegerField(verbose_name="Количество отзывов", default=0)
+    mean = models.FloatField(verbose_name="Средняя длина", default=0.0)
+    m2 = models.FloatField(verbose_name="Сумма квадратов отклонений", default=0.0)
+    max_length = models.PositiveIntegerField(verbose_name="Максимальная длина", default=0)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления", null=True)
+
+    class Meta:
+        verbose_name = "Статистика длин отзывов"
+        verbose_name_plural = "Статистика длин отзывов"
+
+    def std_weight(self):
+        return std_weight(self.count, self.mean, self.m2, self.max_length)
+
+    def as_tuple(self):
+        return self.count, self.mean, self.m2, self.max_length
+
+    @classmethod
+    def add_lengths(cls, employee_id, lengths):
+        # Добавляем пачку длин (параллельное объединение статистик по Чану)
+        lengths = list(lengths)
+        if not lengths:
+            return None
+
+        with transaction.atomic():
+            stats, _ = cls.objects.select_for_update().get_or_create(employee_id=employee_id)
+
+            count = len(lengths)
+            mean = sum(lengths) / count
+            m2 = sum((length - mean) ** 2 for length in lengths)
+
+            total = stats.count + count
+            delta = mean - stats.mean
+            stats.mean += delta * count / total
+            stats.m2 += m2 + delta ** 2 * stats.count * count / total
+            stats.count = total
+            stats.max_length = max(stats.max_length, max(lengths))
+            stats.save()
+        return stats
+
+    @classmethod
+    def remove_length(cls, employee_id, length):
+        # Обратный шаг Уэлфорда при удалении отзыва
+        with transaction.atomic():
+            stats = cls.objects.select_for_update().filter(employee_id=employee_id).first()
+            if stats is None:
+                return None
+
+            if stats.count <= 1:
+                stats.count, stats.mean, stats.m2, stats.max_length = 0, 0.0, 0.0, 0
+            else:
+                old_mean = stats.mean
+                stats.count -= 1
+                stats.mean = (old_mean * (stats.count + 1) - length) / stats.count
+                stats.m2 = max(stats.m2 - (length - old_mean) * (length - stats.mean), 0.0)
+                if length >= stats.max_length:
+                    # Максимум нельзя откатить инкрементально — берем его по индексу длин
+                    stats.max_length = Feedback.objects.filter(employee_id=employee_id).aggregate(
+                        max_length=Max('text_length')
+                    )['max_length'] or 0
+            stats.save()
+        return stats
+
+    @classmethod
+    def aggregate_from_feedback(cls, employee_ids=None):
+        # Статистика, посчитанная заново по сохраненным длинам отзывов одним агрегирующим запросом
+        feedbacks = Feedback.objects.all()
+        if employee_ids is not None:
+            feedbacks = feedbacks.filter(employee_id__in=employee_ids)
+
+        rows = feedbacks.values('employee_id').annotate(
+            rows_count=Count('id'),
+            total=Sum('text_length'),
+            total_sq=Sum(F('text_length') * F('text_length')),
+            longest=Max('text_length'),
+        )
+        result = {}
+        for row in rows:
+            mean = row['total'] / row['rows_count']
+            result[row['employee_id']] = cls(
+                employee_id=row['employee_id'],
+                count=row['rows_count'],
+                mean=mean,
+                m2=max(row['total_sq'] - row['rows_count'] * mean ** 2, 0.0),
+                max_length=row['longest'],
+            )
+        return result
 
  
 class GeneralSummary(models.Model):
@@ -129,19 +336,34 @@ class GeneralSummary(models.Model):
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE, verbose_name="Сотрудник")
     score = models.FloatField(verbose_name="Общая оценка", null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания", null=True) 
+    feedback = models.ManyToManyField(Feedback, related_name="general_summaries", blank=True, verbose_name="Учтенные отзывы")
+    reviews_weight = models.FloatField(verbose_name="Суммарный вес учтенных отзывов", default=0.0)
+    aspect_catalog_version = models.PositiveIntegerField(default=0, verbose_name="Версия каталога аспектов")
 
     class Meta:
         verbose_name = "Общий вывод"
         verbose_name_plural = "Общие выводы"
+        indexes = [
+            models.Index(fields=['employee', 'created_at'], name='gsummary_emp_created_idx'),
+        ]
 
     def __str__(self):
         return f"Общий вывод для сотрудника {self.employee.id}" 
 
+    @classmethod
+    def latest_for(cls, employee_id):
+        # Последний запуск генерации сводки. Сводки только добавляются, поэтому последняя по дате — актуальная.
+        # Сортировка совпадает с индексом (employee, created_at), id берется из индекса без чтения строк
+        return cls.objects.filter(employee_id=employee_id).order_by('-created_at', '-id')
+
 
 class AspectSummary(models.Model):
     id = models.BigAutoField(primary_key=True)
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE, verbose_name="Сотрудник")
+    general_summary = models.ForeignKey(GeneralSummary, on_delete=models.CASCADE, null=True, blank=True, related_name="aspect_summaries", verbose_name="Общий вывод")
     aspect_name = models.CharField(max_length=255, verbose_name="Название аспекта", default="Unnamed Aspect")
+    aspect = models.ForeignKey(Aspect, on_delete=models.SET_NULL, null=True, blank=True, related_name="summaries", verbose_name="Аспект")
+    aspect_version = models.PositiveIntegerField(null=True, blank=True, verbose_name="Версия аспекта")
     text = models.TextField(verbose_name="Текст аспекта")
     score = models.FloatField(verbose_name="Оценка")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания", null=True)
@@ -149,7 +371,161 @@ class AspectSummary(models.Model):
     class Meta:
         verbose_name = "Вывод по аспекту" 
         verbose_name_plural = "Выводы по аспектам"
+        indexes = [
+            models.Index(fields=['employee', 'created_at'], name='asummary_emp_created_idx'),
+        ]
 
     def __str__(self):
         return f"Аспект {self.aspect_name} - Оценка: {self.score}"
- 
\ No newline at end of file
+ 
+
+
+class Job(models.Model):
+    # Фоновая задача, хранится в БД и выполняется процессом run_worker
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, "В очереди"),
+        (RUNNING, "Выполняется"),
+        (DONE, "Выполнена"),
+        (FAILED, "Ошибка"),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=50, verbose_name="Тип задачи")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED, verbose_name="Статус")
+    payload = models.JSONField(default=dict, verbose_name="Параметры")
+    result = models.JSONField(null=True, blank=True, verbose_name="Результат")
+    error = models.TextField(null=True, blank=True, verbose_name="Ошибка")
+    worker = models.CharField(max_length=100, blank=True, default="", verbose_name="Обработчик")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания", null=True)
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Дата запуска")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Дата завершения")
+
+    class Meta:
+        verbose_name = "Фоновая задача"
+        verbose_name_plural = "Фоновые задачи"
+        indexes = [
+            models.Index(fields=['status', 'id'], name='job_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Задача {self.id} ({self.kind}) - {self.status}"
+
+
+class WeightRecomputeRun(models.Model):
+    # Журнал пересчетов весов: по нему определяются сотрудники, изменившиеся с прошлого запуска
+    id = models.BigAutoField(primary_key=True)
+    started_at = models.DateTimeField(verbose_name="Дата запуска")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Дата завершения")
+    changed_only = models.BooleanField(default=False, verbose_name="Только изменившиеся")
+    employees = models.PositiveIntegerField(default=0, verbose_name="Сотрудников")
+    feedbacks = models.PositiveIntegerField(default=0, verbose_name="Отзывов")
+    updated = models.PositiveIntegerField(default=0, verbose_name="Обновлено весов")
+
+    class Meta:
+        verbose_name = "Пересчет весов"
+        verbose_name_plural = "Пересчеты весов"
+
+    def __str__(self):
+        return f"Пересчет весов {self.started_at:%Y-%m-%d %H:%M}"
+
+
+class LLMResponseCache(models.Model):
+    # Кеш ответов LLM: ключ — хеш промта вместе с параметрами генерации
+    key = models.CharField(max_length=64, primary_key=True, verbose_name="Ключ")
+    response = models.JSONField(verbose_name="Ответ")
+    hits = models.PositiveIntegerField(default=0, verbose_name="Попаданий")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    last_used_at = models.DateTimeField(auto_now_add=True, verbose_name="Последнее использование")
+
+    class Meta:
+        verbose_name = "Ответ LLM в кеше"
+        verbose_name_plural = "Кеш ответов LLM"
+        indexes = [
+            models.Index(fields=['last_used_at'], name='llm_cache_last_used_idx'),
+            models.Index(fields=['created_at'], name='llm_cache_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Ответ LLM {self.key[:12]}"
+
+
+class SummaryRefreshRun(models.Model):
+    # Прогресс планового обновления сводок: очередь сотрудников, обработанные и израсходованный бюджет LLM
+    RUNNING = 'running'
+    FINISHED = 'finished'
+    BUDGET_EXHAUSTED = 'budget'
+    STATUS_CHOICES = [
+        (RUNNING, "Выполняется"),
+        (FINISHED, "Завершен"),
+        (BUDGET_EXHAUSTED, "Исчерпан бюджет"),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=RUNNING, verbose_name="Статус")
+    queue = models.JSONField(default=list, verbose_name="Очередь сотрудников")
+    done = models.JSONField(default=list, verbose_name="Обработанные сотрудники")
+    failed = models.JSONField(default=dict, verbose_name="Ошибки по сотрудникам")
+    max_calls = models.PositiveIntegerField(null=True, blank=True, verbose_name="Бюджет запросов к LLM")
+    max_tokens = models.PositiveIntegerField(null=True, blank=True, verbose_name="Бюджет токенов")
+    llm_calls = models.PositiveIntegerField(default=0, verbose_name="Запросов к LLM")
+    llm_tokens = models.PositiveIntegerField(default=0, verbose_name="Токенов (оценка)")
+    elapsed = models.FloatField(default=0.0, verbose_name="Время работы, сек")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    class Meta:
+        verbose_name = "Плановое обновление сводок"
+        verbose_name_plural = "Плановые обновления сводок"
+
+    def __str__(self):
+        return f"Обновление сводок {self.id} - {self.status}"
+
+    def remaining(self):
+        processed = set(self.done) | {int(employee_id) for employee_id in self.failed}
+        return [employee_id for employee_id in self.queue if employee_id not in processed]
+
+
+class SummaryLease(models.Model):
+    # Аренда операции над сводкой: пока она действует, другие запросы той же операции по тому же
+    # сотруднику не запускают LLM, а дожидаются результата владельца (в любом процессе)
+    GENERATE = 'generate'
+    REFRESH_ASPECTS = 'refresh_aspects'
+    KIND_CHOICES = [
+        (GENERATE, "Генерация сводки"),
+        (REFRESH_ASPECTS, "Переоценка аспектов"),
+    ]
+
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (RUNNING, "Выполняется"),
+        (DONE, "Выполнена"),
+        (FAILED, "Ошибка"),
+    ]
+
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='summary_leases', verbose_name="Сотрудник")
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name="Операция")
+    owner = models.CharField(max_length=100, verbose_name="Владелец")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=RUNNING, verbose_name="Статус")
+    expires_at = models.DateTimeField(verbose_name="Действует до")
+    result = models.JSONField(null=True, blank=True, verbose_name="Результат")
+    error = models.TextField(null=True, blank=True, verbose_name="Ошибка")
+    error_status = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name="HTTP-статус ошибки")
+    coalesced = models.PositiveIntegerField(default=0, verbose_name="Присоединившихся запросов")
+    started_at = models.DateTimeField(verbose_name="Дата запуска")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Дата завершения")
+
+    class Meta:
+        verbose_name = "Операция над сводкой"
+        verbose_name_plural = "Операции над сводками"
+        constraints = [
+            models.UniqueConstraint(fields=['employee', 'kind'], name='unique_summary_lease_kind'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.employee_id} - {self.status}"
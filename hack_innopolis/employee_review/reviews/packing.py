@@ -0,0 +1,42 @@
+def pack_first_fit_decreasing(sizes, capacity):
+    # Упаковка в контейнеры First Fit Decreasing: элементы от больших к меньшим кладутся
+    # в первый контейнер, где хватает места. Дает не больше 11/9·OPT + 1 контейнеров.
+    # Элемент больше capacity занимает отдельный контейнер.
+    # Возвращает списки индексов элементов; внутри контейнера индексы по возрастанию
+    order = sorted(range(len(sizes)), key=lambda index: (-sizes[index], index))
+    bins = []
+    free = []
+    for index in order:
+        size = sizes[index]
+        for bin_index, space in enumerate(free):
+            if size <= space:
+                bins[bin_index].append(index)
+                free[bin_index] -= size
+                break
+        else:
+            bins.append([index])
+            free.append(capacity - size)
+    return [sorted(items) for items in bins]
+
+
+def sequential_bin_count(sizes, capacity):
+    # Число контейнеров при жадной упаковке по порядку — для сравнения с FFD
+    count = 0
+    used = capacity
+    for size in sizes:
+        if used + size > capacity:
+            count += 1
+            used = 0
+        used += size
+    return count
+
+
+def packing_stats(sizes, bins, capacity):
+    # Эффективность упаковки: заполненность контейнеров и сколько запросов сэкономлено
+    used = sum(sizes)
+    return {
+        "items": len(sizes),
+        "chunks": len(bins),
+        "sequential_chunks": sequential_bin_count(sizes, capacity),
+        "fill_ratio": round(used / (len(bins) * capacity), 3) if bins else 0.0,
+    }
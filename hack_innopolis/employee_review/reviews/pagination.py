@@ -0,0 +1,95 @@
+import base64
+import binascii
+import json
+from datetime import datetime, timezone
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+
+PAGE_SIZE = 50  # Записей на странице по умолчанию
+EXPORT_PAGE_SIZE = 1000  # Записей за один запрос при потоковой выгрузке
+MAX_PAGE_SIZE = 500  # Верхняя граница ?limit
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)  # Замена пустых дат при сортировке
+
+
+class CursorError(ValueError):
+    pass
+
+
+def encode_cursor(ordering, value, last_id):
+    if isinstance(value, datetime):
+        value = {"dt": value.isoformat()}
+    raw = json.dumps({"o": ordering, "v": value, "id": last_id}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def is_db_int(value):
+    return isinstance(value, int) and not isinstance(value, bool) and -2 ** 63 <= value < 2 ** 63
+
+
+def decode_cursor(cursor, ordering, value_type):
+    # Курсор — сортировка, значение поля сортировки и id последней записи предыдущей страницы.
+    # Курсор другой сортировки или со значением не того типа отклоняется (CursorError -> 400)
+    if not cursor:
+        return None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise CursorError("Некорректный курсор.")
+    if not isinstance(payload, dict) or not is_db_int(payload.get("id")):
+        raise CursorError("Некорректный курсор.")
+    if payload.get("o") != ordering:
+        raise CursorError("Курсор получен для другой сортировки, начните с первой страницы.")
+
+    value = payload.get("v")
+    if value_type is datetime:
+        value = parse_datetime(value.get("dt") or "") if isinstance(value, dict) and isinstance(value.get("dt"), str) else None
+        if value is None:
+            raise CursorError("Некорректный курсор.")
+    elif not is_db_int(value):
+        raise CursorError("Некорректный курсор.")
+    return value, payload["id"]
+
+
+def page_size(params, default=PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    try:
+        limit = int(params.get('limit', default))
+    except (TypeError, ValueError):
+        raise CursorError("limit должен быть числом.")
+    return max(1, min(limit, maximum))
+
+
+def keyset_page(queryset, field, descending, cursor, limit, ordering):
+    # Страница по ключу (field, id): условие на последнюю запись вместо OFFSET,
+    # поэтому стоимость запроса не растет с номером страницы.
+    # queryset должен возвращать словари (values) с ключами field и 'id'; ordering записывается в курсор
+    if cursor is not None:
+        value, last_id = cursor
+        if field == 'id':
+            queryset = queryset.filter(id__gt=last_id)
+        else:
+            before = Q(**{f'{field}__lt' if descending else f'{field}__gt': value})
+            queryset = queryset.filter(before | Q(**{field: value, 'id__gt': last_id}))
+
+    order = [f'-{field}' if descending else field, 'id'] if field != 'id' else ['id']
+    rows = list(queryset.order_by(*order)[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(ordering, rows[-1][field], rows[-1]['id'])
+    return rows, next_cursor
+
+
+def iter_keyset(queryset, size=EXPORT_PAGE_SIZE):
+    # Все записи queryset (values с ключом 'id') страницами по id: один запрос на страницу,
+    # в памяти не больше одной страницы
+    last_id = None
+    while True:
+        page = queryset.filter(id__gt=last_id) if last_id is not None else queryset
+        rows = list(page.order_by('id')[:size])
+        yield from rows
+        if len(rows) < size:
+            return
+        last_id = rows[-1]['id']
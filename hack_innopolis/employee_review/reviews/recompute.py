@@ -0,0 +1,92 @@
+import time
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .models import EmployeeDataVersion, Feedback, FeedbackLengthStats, WeightRecomputeRun
+from .sentiment import sentiment_scorer
+from .weights import combine_weights, emotion_weight, grouped_std_weights
+
+
+
+EMPLOYEE_CHUNK_SIZE = 200  # Сотрудников, загружаемых и пересчитываемых за один проход
+UPDATE_BATCH_SIZE = 500  # Размер пачки для bulk_update
+WEIGHT_TOLERANCE = 1e-9  # Веса, изменившиеся меньше чем на это значение, не перезаписываются
+
+
+def changed_employee_ids(since):
+    # Сотрудники, у которых менялся набор отзывов после указанного момента
+    stats = FeedbackLengthStats.objects.all()
+    if since is not None:
+        stats = stats.filter(updated_at__gte=since)
+    return list(stats.order_by('employee_id').values_list('employee_id', flat=True))
+
+
+def load_polarities(rows):
+    # Полярность по хешу текста; тексты читаются только для тех отзывов, которых нет в кеше
+    digests = [row[3] for row in rows]
+    scores = sentiment_scorer.known_scores(digests)
+    missing_ids = [row[0] for row in rows if row[3] not in scores]
+    if missing_ids:
+        texts = []
+        for start in range(0, len(missing_ids), UPDATE_BATCH_SIZE):
+            texts.extend(Feedback.objects.filter(id__in=missing_ids[start:start + UPDATE_BATCH_SIZE]).values_list('digest', 'text'))
+        scores.update(zip((digest for digest, _ in texts), sentiment_scorer.score_batch([text for _, text in texts])))
+    return np.array([scores[digest] for digest in digests], dtype=float)
+
+
+def recompute_chunk(employee_ids):
+    rows = list(
+        Feedback.objects.filter(employee_id__in=employee_ids)
+        .order_by('employee_id', 'id')
+        .values_list('id', 'employee_id', 'text_length', 'digest', 'is_self_review', 'weight')
+    )
+    if not rows:
+        return 0, 0
+
+    ids = np.array([row[0] for row in rows])
+    row_employee_ids = np.array([row[1] for row in rows])
+    _, group_index = np.unique([row[1] for row in rows], return_inverse=True)
+    lengths = np.array([row[2] for row in rows], dtype=float)
+    is_self_review = np.array([row[4] for row in rows], dtype=bool)
+    old_weights = np.array([row[5] for row in rows], dtype=float)
+
+    std_weights = grouped_std_weights(group_index, lengths)
+    emotion_weights = emotion_weight(load_polarities(rows))
+    new_weights = combine_weights(std_weights, emotion_weights, is_self_review)
+
+    changed = np.abs(new_weights - old_weights) > WEIGHT_TOLERANCE
+    feedbacks = [Feedback(id=int(feedback_id), weight=float(weight)) for feedback_id, weight in zip(ids[changed], new_weights[changed])]
+    with transaction.atomic():
+        Feedback.objects.bulk_update(feedbacks, ['weight'], batch_size=UPDATE_BATCH_SIZE)
+        EmployeeDataVersion.changed(int(employee_id) for employee_id in np.unique(row_employee_ids[changed]))
+    return len(rows), len(feedbacks)
+
+
+def recompute_feedback_weights(changed_only=False, chunk_size=EMPLOYEE_CHUNK_SIZE, log=None):
+    # Пересчет весов всех отзывов по полному набору отзывов каждого сотрудника.
+    # changed_only — только сотрудники, чьи отзывы менялись с последнего успешного пересчета
+    run = WeightRecomputeRun(started_at=timezone.now(), changed_only=changed_only)
+
+    since = None
+    if changed_only:
+        last_run = WeightRecomputeRun.objects.filter(finished_at__isnull=False).order_by('-started_at').first()
+        since = last_run.started_at if last_run else None
+
+    employee_ids = changed_employee_ids(since)
+    started = time.monotonic()
+    for start in range(0, len(employee_ids), chunk_size):
+        chunk = employee_ids[start:start + chunk_size]
+        feedbacks, updated = recompute_chunk(chunk)
+        run.employees += len(chunk)
+        run.feedbacks += feedbacks
+        run.updated += updated
+        if log:
+            log(f"Обработано сотрудников: {run.employees}/{len(employee_ids)}, обновлено весов: {run.updated}")
+
+    run.finished_at = timezone.now()
+    run.save()
+    if log:
+        log(f"Пересчет завершен за {time.monotonic() - started:.1f} с")
+    return run
@@ -0,0 +1,97 @@
+import threading
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import EmployeeDataVersion
+
+
+
+EMPLOYEE_CACHE_ALIAS = getattr(settings, 'EMPLOYEE_CACHE_ALIAS', 'default')  # Кеш из settings.CACHES
+EMPLOYEE_CACHE_TTL = getattr(settings, 'EMPLOYEE_CACHE_TTL', 300)  # Время жизни закешированного ответа, сек
+
+
+def canonical_query(params):
+    # Параметры запроса в порядке имен: одинаковые запросы дают одинаковые ключи и ETag
+    return '&'.join(f"{name}={value}" for name, value in sorted(params.items()))
+
+
+class EmployeeResponseCache:
+    # Кеш ответов API по сотруднику. В ключ ответа входит зафиксированная версия данных сотрудника
+    # из БД (EmployeeDataVersion), поэтому запись из любого процесса (воркер, планировщик, другой
+    # экземпляр сервера) делает старые ответы недостижимыми без явного сброса кеша
+
+    def __init__(self, alias=EMPLOYEE_CACHE_ALIAS, ttl=EMPLOYEE_CACHE_TTL):
+        self.alias = alias
+        self.ttl = ttl
+        self.hits = {}
+        self.misses = {}
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @staticmethod
+    def response_key(employee_id, version, endpoint, params):
+        return f"reviews:employee:{employee_id}:{version}:{endpoint}:{canonical_query(params)}"
+
+    def fetch(self, employee_id, version, endpoint, params, build):
+        # Читаем ответ из кеша, при промахе строим его и сохраняем (только успешные ответы).
+        # Версия читается до построения ответа: если запись зафиксирована между чтением версии
+        # и запросом данных, более новый ответ попадет под старый ключ, но устаревший под новый — никогда
+        key = self.response_key(employee_id, version, endpoint, params)
+        data = self.cache.get(key)
+        if data is not None:
+            self._count(self.hits, endpoint)
+            return Response(data, status=status.HTTP_200_OK)
+
+        self._count(self.misses, endpoint)
+        response = build()
+        if response.status_code == status.HTTP_200_OK and hasattr(response, 'data'):
+            self.cache.set(key, response.data, timeout=self.ttl)
+        return response
+
+    def _count(self, counters, endpoint):
+        with self._lock:
+            counters[endpoint] = counters.get(endpoint, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            endpoints = sorted(set(self.hits) | set(self.misses))
+            by_endpoint = {}
+            for endpoint in endpoints:
+                hits, misses = self.hits.get(endpoint, 0), self.misses.get(endpoint, 0)
+                by_endpoint[endpoint] = {"hits": hits, "misses": misses, "hit_ratio": round(hits / (hits + misses), 4)}
+            hits, misses = sum(self.hits.values()), sum(self.misses.values())
+            return {
+                "backend": self.cache.__class__.__name__,
+                "hits": hits,
+                "misses": misses,
+                "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+                "endpoints": by_endpoint,
+            }
+
+
+employee_response_cache = EmployeeResponseCache()
+
+
+def cached_by_employee(endpoint, bypass_params=()):
+    # Декоратор get-метода APIView с аргументом employee_id.
+    # Запросы с параметрами из bypass_params (например, потоковая выгрузка) не кешируются
+    def decorator(get):
+        @wraps(get)
+        def wrapper(self, request, employee_id):
+            params = request.query_params
+            if any(name in params for name in bypass_params):
+                return get(self, request, employee_id)
+            # Версию уже прочитал conditional_by_employee (ETag) — берем ее, а не читаем заново
+            version = getattr(request, 'employee_data_version', None)
+            if version is None:
+                version, _ = EmployeeDataVersion.current(employee_id)
+            return employee_response_cache.fetch(employee_id, version, endpoint, params, lambda: get(self, request, employee_id))
+        return wrapper
+    return decorator
@@ -0,0 +1,142 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum
+
+from .llm import LLMUsage
+from .models import Employee, Feedback, GeneralSummary, SummaryRefreshRun
+from .summary import SummaryError, SummaryGenerator
+
+
+
+SUMMARY_REFRESH_WORKERS = getattr(settings, 'SUMMARY_REFRESH_WORKERS', 2)  # Сотрудников, обрабатываемых одновременно
+SUMMARY_REFRESH_MAX_CALLS = getattr(settings, 'SUMMARY_REFRESH_MAX_CALLS', None)  # Бюджет запросов к LLM на запуск
+SUMMARY_REFRESH_MAX_TOKENS = getattr(settings, 'SUMMARY_REFRESH_MAX_TOKENS', None)  # Бюджет токенов на запуск
+
+
+def stale_employees(min_new=1, limit=None):
+    # Сотрудники с отзывами, появившимися после последней сводки, в порядке убывания
+    # суммарного веса новых отзывов, затем их количества. Один агрегирующий запрос
+    latest_summary_at = GeneralSummary.latest_for(OuterRef('employee')).values('created_at')[:1]
+    rows = (
+        Feedback.objects.annotate(last_summary_at=Subquery(latest_summary_at))
+        .filter(Q(last_summary_at__isnull=True) | Q(created_at__gt=F('last_summary_at')))
+        .values('employee_id')
+        .annotate(new_count=Count('id'), new_weight=Sum('weight'))
+        .filter(new_count__gte=min_new)
+        .order_by('-new_weight', '-new_count', 'employee_id')
+    )
+    if limit:
+        rows = rows[:limit]
+    return list(rows)
+
+
+class SummaryRefreshScheduler:
+    # Обновляет сводки самых устаревших сотрудников пулом потоков, пока не исчерпан бюджет LLM.
+    # Прогресс сохраняется в SummaryRefreshRun после каждого сотрудника, поэтому запуск можно продолжить
+
+    def __init__(self, run, workers=SUMMARY_REFRESH_WORKERS, full=False, log=print):
+        self.run = run
+        self.workers = max(1, workers)
+        self.full = full
+        self.log = log
+        self.usage = LLMUsage()
+        self._lock = threading.Lock()
+        # Продолжение запуска учитывает уже израсходованный бюджет
+        self.base_calls = run.llm_calls
+        self.base_tokens = run.llm_tokens
+        self.base_elapsed = run.elapsed
+
+    @classmethod
+    def start(cls, max_calls=SUMMARY_REFRESH_MAX_CALLS, max_tokens=SUMMARY_REFRESH_MAX_TOKENS, limit=None, **kwargs):
+        queue = [row['employee_id'] for row in stale_employees(limit=limit)]
+        run = SummaryRefreshRun.objects.create(queue=queue, max_calls=max_calls, max_tokens=max_tokens)
+        return cls(run, **kwargs)
+
+    @classmethod
+    def resume(cls, **kwargs):
+        run = SummaryRefreshRun.objects.filter(status__in=[SummaryRefreshRun.RUNNING, SummaryRefreshRun.BUDGET_EXHAUSTED]).order_by('-id').first()
+        return cls(run, **kwargs) if run else None
+
+    def calls_used(self):
+        return self.base_calls + self.usage.requests
+
+    def tokens_used(self):
+        return self.base_tokens + self.usage.tokens
+
+    def budget_exhausted(self):
+        run = self.run
+        return (
+            (run.max_calls is not None and self.calls_used() >= run.max_calls)
+            or (run.max_tokens is not None and self.tokens_used() >= run.max_tokens)
+        )
+
+    def execute(self):
+        started = time.monotonic()
+        remaining = self.run.remaining()
+        self.log(f"Обновление сводок {self.run.id}: сотрудников в очереди {len(remaining)}")
+
+        running = set()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='summary-refresh') as executor:
+            while remaining or running:
+                # Новые сотрудники берутся, только пока бюджет не исчерпан; начатые доводятся до конца
+                while remaining and len(running) < self.workers and not self.budget_exhausted():
+                    running.add(executor.submit(self.refresh_employee, remaining.pop(0)))
+                if not running:
+                    break
+                _, running = wait(running, return_when=FIRST_COMPLETED)
+                self.save_progress(started)
+
+        run = self.run
+        # Ошибки учитываются в run.failed, поэтому без исчерпания бюджета очередь всегда пуста
+        run.status = SummaryRefreshRun.BUDGET_EXHAUSTED if run.remaining() and self.budget_exhausted() else SummaryRefreshRun.FINISHED
+        self.save_progress(started)
+
+        report = self.throughput()
+        self.log(
+            f"Обновление сводок {run.id} {run.get_status_display().lower()}: обработано {len(run.done)}, "
+            f"ошибок {len(run.failed)}, запросов к LLM {run.llm_calls}, токенов ~{run.llm_tokens}, "
+            f"{report['employees_per_minute']} сотр./мин, {report['calls_per_minute']} запросов/мин"
+        )
+        return run
+
+    def refresh_employee(self, employee_id):
+        try:
+            employee = Employee.objects.get(id=employee_id)
+            SummaryGenerator(usage=self.usage).generate(employee, full=self.full)
+        except Exception as e:
+            # Любая ошибка сотрудника записывается в failed: иначе wait() проглотит ее,
+            # а сотрудник останется в очереди и будет повторяться при каждом --resume
+            if isinstance(e, SummaryError):
+                error = e.detail
+            elif isinstance(e, Employee.DoesNotExist):
+                error = "Сотрудник не найден."
+            else:
+                error = f"Ошибка обновления сводки: {e!r}"
+            with self._lock:
+                self.run.failed[str(employee_id)] = error
+            self.log(f"Сотрудник {employee_id}: {error}")
+        else:
+            with self._lock:
+                self.run.done.append(employee_id)
+        finally:
+            connection.close()  # У каждого потока свое соединение с БД
+
+    def save_progress(self, started):
+        with self._lock:
+            self.run.llm_calls = self.calls_used()
+            self.run.llm_tokens = self.tokens_used()
+            self.run.elapsed = self.base_elapsed + time.monotonic() - started
+            self.run.save()
+
+    def throughput(self):
+        minutes = self.run.elapsed / 60
+        if not minutes:
+            return {"employees_per_minute": 0, "calls_per_minute": 0}
+        return {
+            "employees_per_minute": round(len(self.run.done) / minutes, 2),
+            "calls_per_minute": round(self.run.llm_calls / minutes, 2),
+        }
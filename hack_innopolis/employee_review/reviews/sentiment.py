@@ -0,0 +1,119 @@
+import atexit
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from textblob import TextBlob
+
+from .digests import text_digest
+from .models import SentimentScore
+
+
+
+SENTIMENT_CACHE_SIZE = getattr(settings, 'SENTIMENT_CACHE_SIZE', 10000)  # Размер кеша в памяти процесса
+SENTIMENT_WORKERS = getattr(settings, 'SENTIMENT_WORKERS', os.cpu_count() or 1)  # Процессов в пуле
+SENTIMENT_POOL_MIN_BATCH = getattr(settings, 'SENTIMENT_POOL_MIN_BATCH', 64)  # Меньшие пачки считаются в текущем процессе
+QUERY_CHUNK_SIZE = 500
+
+
+def compute_polarity(text):
+    # Полярность текста (от -1 до 1). Функция уровня модуля, чтобы ее можно было передать в пул процессов
+    return TextBlob(text).sentiment.polarity
+
+
+class SentimentScorer:
+    # Сервис оценки тональности: кеш в памяти (LRU по хешу текста),
+    # персистентное хранилище SentimentScore и пул процессов для больших пачек
+
+    def __init__(self, cache_size=SENTIMENT_CACHE_SIZE, workers=SENTIMENT_WORKERS, pool_min_batch=SENTIMENT_POOL_MIN_BATCH):
+        self.cache_size = cache_size
+        self.workers = workers
+        self.pool_min_batch = pool_min_batch
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def score(self, text):
+        return self.score_batch([text])[0]
+
+    def score_batch(self, texts):
+        digests = [text_digest(text) for text in texts]
+        scores = self._from_cache(digests)
+
+        missing = [digest for digest in dict.fromkeys(digests) if digest not in scores]
+        if missing:
+            stored = self._from_store(missing)
+            scores.update(stored)
+            self._to_cache(stored)
+
+        # Уникальные тексты, которых нет ни в кеше, ни в хранилище
+        to_compute = {}
+        for digest, text in zip(digests, texts):
+            if digest not in scores:
+                to_compute.setdefault(digest, text)
+
+        if to_compute:
+            computed = dict(zip(to_compute, self._compute(list(to_compute.values()))))
+            SentimentScore.objects.bulk_create(
+                [SentimentScore(digest=digest, polarity=polarity) for digest, polarity in computed.items()],
+                batch_size=QUERY_CHUNK_SIZE,
+                ignore_conflicts=True,
+            )
+            scores.update(computed)
+            self._to_cache(computed)
+
+        return [scores[digest] for digest in digests]
+
+    def known_scores(self, digests):
+        # Полярности по хешам без пересчета: из кеша и хранилища. Неизвестные хеши отсутствуют в результате
+        digests = list(dict.fromkeys(digests))
+        scores = self._from_cache(digests)
+        missing = [digest for digest in digests if digest not in scores]
+        if missing:
+            stored = self._from_store(missing)
+            scores.update(stored)
+            self._to_cache(stored)
+        return scores
+
+    def _from_cache(self, digests):
+        found = {}
+        with self._lock:
+            for digest in digests:
+                if digest in self._cache:
+                    self._cache.move_to_end(digest)
+                    found[digest] = self._cache[digest]
+        return found
+
+    def _to_cache(self, scores):
+        with self._lock:
+            for digest, polarity in scores.items():
+                self._cache[digest] = polarity
+                self._cache.move_to_end(digest)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _from_store(self, digests):
+        found = {}
+        for start in range(0, len(digests), QUERY_CHUNK_SIZE):
+            chunk = digests[start:start + QUERY_CHUNK_SIZE]
+            found.update(SentimentScore.objects.filter(digest__in=chunk).values_list('digest', 'polarity'))
+        return found
+
+    def _compute(self, texts):
+        if self.workers <= 1 or len(texts) < self.pool_min_batch:
+            return [compute_polarity(text) for text in texts]
+
+        chunksize = max(1, len(texts) // (self.workers * 4))
+        return list(self._get_pool().map(compute_polarity, texts, chunksize=chunksize))
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                atexit.register(self._pool.shutdown)
+            return self._pool
+
+
+sentiment_scorer = SentimentScorer()
@@ -1,4 +1,6 @@
+from django.db import IntegrityError
 from rest_framework import serializers
+from .digests import text_digest
 from .models import Feedback, ReviewCreator, Employee, Aspect
 
 
@@ -53,13 +55,9 @@ class FeedbackSerializer(serializers.Serializer):
         else:
             employee = None  # Или какое-то значение по умолчанию, если нужно
 
-        # Проверяем, существует ли уже такой же отзыв
+        # Проверяем, существует ли уже такой же отзыв (проба по уникальному индексу хеша текста)
         if reviewer and employee:  # Проверяем, что оба объекта существуют
-            existing_feedback = Feedback.objects.filter(
-                text=validated_data['review'],
-                employee=employee,
-                review_creator=reviewer
-            ).first()
+            existing_feedback = self.find_duplicate(employee, reviewer, validated_data['review'])
             
             if existing_feedback:
                 return existing_feedback  # Если отзыв уже существует, возвращаем его
@@ -71,7 +69,19 @@ class FeedbackSerializer(serializers.Serializer):
                 employee=employee,
                 review_creator=reviewer
             )
-            feedback.save()  # Сохраняем отзыв и рассчитываем вес
+            try:
+                feedback.save()  # Сохраняем отзыв и рассчитываем вес
+            except IntegrityError:
+                # Такой же отзыв успели сохранить параллельно
+                return self.find_duplicate(employee, reviewer, validated_data['review'])
             return feedback
 
         return None  # Если отзыв не создан, возвращаем None
+
+    @staticmethod
+    def find_duplicate(employee, reviewer, text):
+        return Feedback.objects.filter(
+            employee=employee,
+            review_creator=reviewer,
+            digest=text_digest(text)
+        ).first()
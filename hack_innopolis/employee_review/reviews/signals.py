@@ -0,0 +1,48 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Aspect, AspectCatalogVersion, AspectSummary, Employee, EmployeeDataVersion, Feedback, FeedbackLengthStats, GeneralSummary
+
+
+
+def deleting_employee(origin):
+    # Удаление началось с сотрудника (объекта или queryset): его данные удаляются каскадом целиком
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model is Employee
+
+
+@receiver(post_delete, sender=Feedback)
+def update_length_stats_on_delete(sender, instance, origin=None, **kwargs):
+    # Удаление отзыва (в том числе каскадное) откатывает статистику длин
+    FeedbackLengthStats.remove_length(instance.employee_id, instance.text_length)
+    EmployeeDataVersion.changed([instance.employee_id], create=not deleting_employee(origin))
+
+
+# Версия данных сотрудника увеличивается при любом сохранении или удалении моделей, из которых
+# строятся ответы API по сотруднику (в том числе из админки). bulk_create и update() сигналов
+# не отправляют — там changed() вызывается явно (ingestion, recompute)
+@receiver(post_save, sender=Feedback)
+@receiver(post_save, sender=GeneralSummary)
+@receiver(post_save, sender=AspectSummary)
+def bump_version_on_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        EmployeeDataVersion.changed([instance.employee_id])
+
+
+@receiver(post_delete, sender=GeneralSummary)
+@receiver(post_delete, sender=AspectSummary)
+def bump_version_on_delete(sender, instance, origin=None, **kwargs):
+    EmployeeDataVersion.changed([instance.employee_id], create=not deleting_employee(origin))
+
+
+@receiver(post_save, sender=Employee)
+def bump_version_on_employee_save(sender, instance, raw=False, **kwargs):
+    # Психотип хранится в самом сотруднике
+    if not raw:
+        EmployeeDataVersion.changed([instance.id])
+
+
+@receiver(post_delete, sender=Aspect)
+def bump_catalog_on_aspect_delete(sender, instance, **kwargs):
+    # Удаление аспекта тоже меняет каталог: сводки, построенные до него, отмечаются устаревшими
+    AspectCatalogVersion.bump()
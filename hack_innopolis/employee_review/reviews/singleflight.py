@@ -0,0 +1,127 @@
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import SummaryLease
+
+
+
+SUMMARY_LEASE_TTL = getattr(settings, 'SUMMARY_LEASE_TTL', 300)  # Срок аренды без продления, сек
+SUMMARY_LEASE_POLL_INTERVAL = getattr(settings, 'SUMMARY_LEASE_POLL_INTERVAL', 0.5)  # Пауза между проверками ожидающих, сек
+
+
+def new_owner():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def acquire(employee_id, kind, owner, ttl=SUMMARY_LEASE_TTL):
+    # Аренда операции kind берется, если ее нет, она завершена или просрочена. Условный UPDATE
+    # атомарен, поэтому из нескольких процессов ее получает только один
+    now = timezone.now()
+    values = {
+        "owner": owner, "status": SummaryLease.RUNNING, "expires_at": now + timedelta(seconds=ttl),
+        "result": None, "error": None, "error_status": None, "started_at": now, "finished_at": None,
+    }
+    taken = SummaryLease.objects.filter(
+        Q(employee_id=employee_id, kind=kind) & (~Q(status=SummaryLease.RUNNING) | Q(expires_at__lt=now))
+    ).update(**values)
+    if taken:
+        return True
+    try:
+        with transaction.atomic():
+            SummaryLease.objects.create(employee_id=employee_id, kind=kind, **values)
+        return True
+    except IntegrityError:
+        return False  # Аренда уже у другого владельца
+
+
+def renew(employee_id, kind, owner, ttl=SUMMARY_LEASE_TTL):
+    return SummaryLease.objects.filter(employee_id=employee_id, kind=kind, owner=owner, status=SummaryLease.RUNNING).update(
+        expires_at=timezone.now() + timedelta(seconds=ttl)
+    )
+
+
+def release(employee_id, kind, owner, result=None, error=None, error_status=None):
+    SummaryLease.objects.filter(employee_id=employee_id, kind=kind, owner=owner).update(
+        status=SummaryLease.FAILED if error else SummaryLease.DONE,
+        result=result, error=error, error_status=error_status, finished_at=timezone.now()
+    )
+
+
+class LeaseHeartbeat(threading.Thread):
+    # Продлевает аренду, пока владелец работает, чтобы долгий запуск не сочли зависшим
+    def __init__(self, employee_id, kind, owner, ttl=SUMMARY_LEASE_TTL):
+        super().__init__(name=f'summary-lease-{kind}-{employee_id}', daemon=True)
+        self.employee_id = employee_id
+        self.kind = kind
+        self.owner = owner
+        self.ttl = ttl
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(self.ttl / 3):
+                renew(self.employee_id, self.kind, self.owner, self.ttl)
+        finally:
+            connection.close()
+
+    def stop(self):
+        self.stopped.set()
+
+
+def single_flight(employee_id, kind, compute, error_class, on_wait=None):
+    # Выполняет compute() только в одном вызове операции kind на сотрудника одновременно. Остальные
+    # вызовы той же операции (в том числе из других процессов) ждут и получают результат владельца
+    # с пометкой "coalesced"; разные операции друг друга не ждут.
+    # Ошибка владельца передается ожидающим как error_class(detail, status_code)
+    owner = new_owner()
+    while True:
+        if acquire(employee_id, kind, owner):
+            return run_as_owner(employee_id, kind, owner, compute, error_class)
+
+        SummaryLease.objects.filter(employee_id=employee_id, kind=kind).update(coalesced=F('coalesced') + 1)
+        if on_wait:
+            on_wait()
+        lease = wait_for_lease(employee_id, kind)
+        if lease is None:
+            continue  # Владелец пропал — пробуем взять аренду сами
+        if lease.status == SummaryLease.FAILED:
+            raise error_class(lease.error, lease.error_status or 500)
+        return {**lease.result, "coalesced": True}
+
+
+def run_as_owner(employee_id, kind, owner, compute, error_class):
+    heartbeat = LeaseHeartbeat(employee_id, kind, owner)
+    heartbeat.start()
+    try:
+        result = compute()
+    except error_class as e:
+        release(employee_id, kind, owner, error=e.detail, error_status=e.status_code)
+        raise
+    except Exception:
+        release(employee_id, kind, owner, error="Ошибка генерации сводки.", error_status=500)
+        raise
+    else:
+        release(employee_id, kind, owner, result=result)
+        return result
+    finally:
+        heartbeat.stop()
+
+
+def wait_for_lease(employee_id, kind, poll_interval=SUMMARY_LEASE_POLL_INTERVAL):
+    # Ждем завершения текущей аренды. None — аренда просрочена или удалена
+    while True:
+        lease = SummaryLease.objects.filter(employee_id=employee_id, kind=kind).first()
+        if lease is None or (lease.status == SummaryLease.RUNNING and lease.expires_at < timezone.now()):
+            return None
+        if lease.status != SummaryLease.RUNNING:
+            return lease
+        time.sleep(poll_interval)
@@ -0,0 +1,473 @@
+import re
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.conf import settings
+from django.db import connection
+from .llm import LLM_CHARS_PER_TOKEN, estimate_tokens, get_llm_client
+from .llm_json import LLMJSONError, parse_llm_json, validate_psychotype, validate_summary
+from .models import Feedback, Aspect, GeneralSummary, SummaryLease
+from .aspects import catalog_version, stale_aspects
+from .packing import pack_first_fit_decreasing, packing_stats
+from .singleflight import single_flight
+from .utils import merge_summary_scores, save_feedback_summary, summary_as_dict, update_aspect_summaries, weighted_mean_scores
+
+
+
+class SummaryError(Exception):
+    def __init__(self, detail, status_code=500):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+class SummaryGenerator:
+    # Генерация сводки по отзывам сотрудника через LLM.
+    # Используется как в HTTP-запросе, так и в фоновом обработчике задач.
+    MAX_PROMPT_LENGTH = 20000  # Максимальная длина промта в символах
+    MAX_PROMPT_TOKENS = getattr(settings, 'SUMMARY_MAX_PROMPT_TOKENS', MAX_PROMPT_LENGTH // LLM_CHARS_PER_TOKEN)  # Токенов в промте с отзывами
+    MAX_CONCURRENCY = getattr(settings, 'LLM_MAX_CONCURRENCY', 4)  # Одновременных запросов к LLM
+    MAX_BATCH_SIZE = getattr(settings, 'LLM_MAX_BATCH_SIZE', 4)  # Промтов в одном запросе generate
+    MAX_CONSOLIDATION_DEPTH = getattr(settings, 'SUMMARY_MAX_CONSOLIDATION_DEPTH', 8)  # Уровней объединения сводок
+    LOCAL_SCORES = getattr(settings, 'SUMMARY_LOCAL_SCORES', True)  # Итоговые оценки — взвешенное среднее оценок частей, а не ответ LLM
+
+    def __init__(self, use_cache=True, usage=None, progress=None):
+        self.use_cache = use_cache  # False — не брать ответы LLM из кеша
+        self.usage = usage  # LLMUsage для подсчета обращений к LLM вызывающей стороной
+        self.progress = progress  # progress(event, data) — уведомления об этапах, вызывается из разных потоков
+        self.consolidation_stats = []  # Глубина, ширина и время каждого уровня объединения сводок
+        self.packing_stats = []  # Число и заполненность промтов с отзывами
+
+    def emit(self, event, **data):
+        if self.progress is not None:
+            self.progress(event, data)
+
+    def generate(self, employee, full=False):
+        # Одновременные запросы по одному сотруднику объединяются: LLM вызывается один раз,
+        # остальные получают тот же результат и не создают дублирующих сводок
+        return single_flight(
+            employee.id, SummaryLease.GENERATE, lambda: self.compute(employee, full), SummaryError,
+            on_wait=lambda: self.emit("coalesced")
+        )
+
+    def compute(self, employee, full=False):
+        # По умолчанию обрабатываются только отзывы, появившиеся после последней сводки.
+        # full=True — полная пересборка по всем отзывам
+        previous = None
+        if not full:
+            previous = GeneralSummary.latest_for(employee.id).first()
+            if previous is not None and not previous.feedback.exists():
+                previous = None  # Сводка без списка учтенных отзывов — объединять не с чем
+
+        if previous is not None:
+            return self.generate_incremental(employee, previous)
+        return self.generate_full(employee)
+
+    def generate_full(self, employee):
+        reviews = list(Feedback.objects.filter(employee=employee).values("id", "text", "weight"))
+        if not reviews:
+            raise SummaryError("Нет отзывов для данного сотрудника.", status_code=404)
+        if not any(review["weight"] > 0 for review in reviews):
+            raise SummaryError("Нет отзывов с ненулевым весом для данного сотрудника.", status_code=404)
+
+        consolidated_summary = self.summarize_reviews(reviews)
+        psychotype_data = self.analyze_psychotype(consolidated_summary)
+        self.emit("psychotype", **psychotype_data)
+        
+        # Сохраняем сводку и психотип
+        general_summary = save_feedback_summary(
+            employee.id, consolidated_summary, psychotype_data,
+            feedback_ids=[review["id"] for review in reviews],
+            reviews_weight=sum(review["weight"] for review in reviews)
+        )
+        self.emit("saved", general_summary_id=general_summary.id if general_summary else None)
+
+        return {
+            "message": "Анализ завершен успешно.",
+            "summary": consolidated_summary,
+            "psychotype": psychotype_data,
+            "mode": "full",
+            "new_reviews": len(reviews),
+            "consolidation": self.consolidation_stats,
+            "packing": self.packing_stats
+        }
+
+    def generate_incremental(self, employee, previous):
+        # Аспекты, добавленные или измененные после предыдущей сводки, сначала оцениваются
+        # по уже учтенным отзывам, иначе их оценка строилась бы только по новым
+        self.refresh_aspects(employee, general_summary=previous)
+
+        reviews = list(
+            Feedback.objects.filter(employee=employee).exclude(general_summaries=previous).values("id", "text", "weight")
+        )
+        previous_summary = summary_as_dict(previous)
+        if not reviews:
+            return {
+                "message": "Новых отзывов нет, сводка актуальна.",
+                "summary": previous_summary,
+                "psychotype": {
+                    "psychotype": employee.psychotype,
+                    "psychotype_description": employee.psychotype_description
+                },
+                "mode": "incremental",
+                "new_reviews": 0
+            }
+
+        feedback_ids = list(previous.feedback.values_list('id', flat=True)) + [review["id"] for review in reviews]
+        partial_weight = sum(review["weight"] for review in reviews)
+        if partial_weight <= 0:
+            # Все новые отзывы с нулевым весом: сводка не меняется, только отмечаем их учтенными
+            psychotype_data = {
+                "psychotype": employee.psychotype,
+                "psychotype_description": employee.psychotype_description
+            }
+            general_summary = save_feedback_summary(
+                employee.id, previous_summary, psychotype_data,
+                feedback_ids=feedback_ids,
+                reviews_weight=previous.reviews_weight
+            )
+            self.emit("saved", general_summary_id=general_summary.id if general_summary else None)
+            return {
+                "message": "Новые отзывы имеют нулевой вес, сводка не изменилась.",
+                "summary": previous_summary,
+                "psychotype": psychotype_data,
+                "mode": "incremental",
+                "new_reviews": len(reviews)
+            }
+
+        # Сводка только по новым отзывам объединяется с предыдущей
+        partial_summary = self.summarize_reviews(reviews)
+        consolidated_summary = self.merge_summaries(previous_summary, previous.reviews_weight, partial_summary, partial_weight)
+        psychotype_data = self.analyze_psychotype(consolidated_summary)
+        self.emit("psychotype", **psychotype_data)
+
+        general_summary = save_feedback_summary(
+            employee.id, consolidated_summary, psychotype_data,
+            feedback_ids=feedback_ids,
+            reviews_weight=previous.reviews_weight + partial_weight
+        )
+        self.emit("saved", general_summary_id=general_summary.id if general_summary else None)
+
+        return {
+            "message": "Анализ завершен успешно.",
+            "summary": consolidated_summary,
+            "psychotype": psychotype_data,
+            "mode": "incremental",
+            "new_reviews": len(reviews),
+            "consolidation": self.consolidation_stats,
+            "packing": self.packing_stats
+        }
+
+    def refresh_aspects(self, employee, aspects=None, general_summary=None):
+        # Переоценка только новых или измененных аспектов в последней сводке сотрудника.
+        # Все переоценки (в том числе перед инкрементальной генерацией) идут под одной арендой,
+        # поэтому одновременные запросы не оценивают одни и те же аспекты дважды
+        return single_flight(
+            employee.id, SummaryLease.REFRESH_ASPECTS, lambda: self.reevaluate_aspects(employee, general_summary, aspects=aspects), SummaryError,
+            on_wait=lambda: self.emit("coalesced")
+        )
+
+    def reevaluate_aspects(self, employee, general_summary=None, aspects=None):
+        if general_summary is None:
+            general_summary = GeneralSummary.latest_for(employee.id).first()
+        if general_summary is None:
+            raise SummaryError("Сводка по сотруднику еще не создана.", status_code=404)
+
+        version = catalog_version()
+        aspects = stale_aspects(general_summary) if aspects is None else aspects
+        if not aspects:
+            # Каталог мог измениться только удалением аспектов — сводка все равно актуальна
+            if general_summary.aspect_catalog_version < version:
+                GeneralSummary.objects.filter(pk=general_summary.pk).update(aspect_catalog_version=version)
+            return {"message": "Все аспекты сводки актуальны.", "aspects": []}
+
+        # Оцениваются те же отзывы, по которым построена сводка
+        reviews = general_summary.feedback.all() if general_summary.feedback.exists() else Feedback.objects.filter(employee=employee)
+        prompts, chunk_weights = self.prepare_prompts(list(reviews.values("id", "text", "weight")), aspects=[aspect.text for aspect in aspects])
+        if not prompts:
+            raise SummaryError("Нет отзывов с ненулевым весом для данного сотрудника.", status_code=404)
+        parts = [self.parse_chunk(evaluation) for evaluation in self.evaluate_prompts(prompts)]
+        if not all(parts):
+            raise SummaryError("Не удалось разобрать ответ LLM по аспектам.")
+
+        updated = update_aspect_summaries(general_summary, aspects, self.reduce_chunks(parts, chunk_weights), version=version)
+        self.emit("aspects", updated=updated)
+        return {"message": "Аспекты переоценены.", "aspects": updated, "general_summary_id": general_summary.id}
+
+    def summarize_reviews(self, reviews):
+        prompts, chunk_weights = self.prepare_prompts(reviews)
+        self.emit("chunks", total=len(prompts))
+        done = []
+
+        def on_chunk(index, evaluation):
+            done.append(index)
+            self.emit("chunk", index=index + 1, done=len(done), total=len(prompts), scores=self.chunk_scores(evaluation))
+
+        evaluations = self.evaluate_prompts(prompts, on_result=on_chunk if self.progress else None)
+        if self.LOCAL_SCORES:
+            parts = [self.parse_chunk(evaluation) for evaluation in evaluations]
+            if all(parts):
+                return self.reduce_chunks(parts, chunk_weights)
+            print("Не все части разобраны как JSON, оценки объединяет LLM")
+
+        all_summaries = [self.clean_summary_text(evaluation) for evaluation in evaluations]
+        return self.get_consolidated_summary(all_summaries)
+
+    def reduce_chunks(self, parts, chunk_weights):
+        # Оценки считаются локально — средним, взвешенным по суммарному весу отзывов части.
+        # LLM нужен только для объединения текстов, а для одной части не нужен вовсе
+        scores = weighted_mean_scores(zip(parts, chunk_weights))
+        if len(parts) == 1:
+            summary = parts[0]
+            self.consolidation_stats.append({"depth": 0, "levels": [], "local_scores": True})
+        else:
+            summary = self.get_consolidated_summary([json.dumps(part, ensure_ascii=False) for part in parts], with_scores=False)
+            if not isinstance(summary, dict):
+                summary = {}
+
+        result = {}
+        for aspect_name, score in scores.items():
+            data = summary.get(aspect_name)
+            if not isinstance(data, dict):
+                # LLM пропустил аспект — берем описание из первой части, где оно есть
+                data = next((part[aspect_name] for part in parts if isinstance(part.get(aspect_name), dict)), {})
+            result[aspect_name] = {"score": score, "description": data.get("description", "")}
+        return result
+
+    @staticmethod
+    def parse_chunk(evaluation, kind='chunk'):
+        # Ответ по части отзывов в виде проверенного словаря или None, если JSON не найден
+        try:
+            return parse_llm_json(evaluation, validate_summary, kind)
+        except LLMJSONError:
+            return None
+
+    @classmethod
+    def chunk_scores(cls, evaluation):
+        # Оценки аспектов из ответа по одной части отзывов (для промежуточных результатов)
+        evaluation = cls.parse_chunk(evaluation, kind=None)
+        if evaluation is None:
+            return {}
+        return {aspect_name: data["score"] for aspect_name, data in evaluation.items()}
+
+    def merge_summaries(self, previous_summary, previous_weight, partial_summary, partial_weight):
+        # Тексты объединяет LLM, а оценки считаются локально — взвешенным средним по весам отзывов
+        scores = merge_summary_scores(previous_summary, previous_weight, partial_summary, partial_weight)
+        merged = self.get_consolidated_summary([
+            json.dumps(previous_summary, ensure_ascii=False),
+            json.dumps(partial_summary, ensure_ascii=False)
+        ], with_scores=False)
+        if not isinstance(merged, dict):
+            return scores
+
+        for aspect_name, data in scores.items():
+            if isinstance(merged.get(aspect_name), dict):
+                merged[aspect_name]["score"] = data["score"]
+            else:
+                merged[aspect_name] = data
+        return merged
+
+    def evaluate_prompts(self, prompts, on_result=None):
+        # Промты объединяются в пакеты по LLM_MAX_BATCH_SIZE, пакеты оцениваются параллельно,
+        # результаты возвращаются в исходном порядке. on_result(index, evaluation) — по мере готовности.
+        # Первая ошибка прерывает весь запуск, как и при последовательной обработке
+        batch_size = max(1, self.MAX_BATCH_SIZE)
+        batches = [list(range(start, min(start + batch_size, len(prompts)))) for start in range(0, len(prompts), batch_size)]
+        results = [None] * len(prompts)
+
+        def evaluate_batch(batch):
+            if len(batch) == 1:
+                return [self.evaluate_reviews_with_llm(prompts[batch[0]])]
+            return self.evaluate_reviews_batch([prompts[index] for index in batch])
+
+        def evaluate_batch_in_thread(batch):
+            try:
+                return evaluate_batch(batch)
+            finally:
+                connection.close()  # Кеш ответов LLM открывает соединение с БД в потоке пула
+
+        workers = min(self.MAX_CONCURRENCY, len(batches))
+        if workers <= 1:
+            for batch in batches:
+                for index, evaluation in zip(batch, evaluate_batch(batch)):
+                    results[index] = self.check_evaluation(evaluation)
+                    if on_result:
+                        on_result(index, evaluation)
+            return results
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='llm') as executor:
+            futures = {executor.submit(evaluate_batch_in_thread, batch): batch for batch in batches}
+            try:
+                for future in as_completed(futures):
+                    for index, evaluation in zip(futures[future], future.result()):
+                        results[index] = self.check_evaluation(evaluation)
+                        if on_result:
+                            on_result(index, evaluation)
+            except SummaryError:
+                for future in futures:
+                    future.cancel()  # Еще не начатые запросы не отправляем
+                raise
+        return results
+
+    @staticmethod
+    def check_evaluation(evaluation):
+        if isinstance(evaluation, dict) and "error" in evaluation:
+            raise SummaryError(evaluation["error"])
+        return evaluation
+
+    def analyze_psychotype(self, consolidated_summary):
+        prompt = (
+            f"Вот общая сводка по сотруднику на основе отзывов:\n\n{consolidated_summary}\n\n"
+            "На основе этой информации, определите психотип сотрудника. Верните краткий вывод о психотипе. "
+            "Верни ответ в формате JSON без лишней информации и пояснения:\n"
+            "{\n"
+            '  "psychotype": "психотип сотрудника",\n'
+            '  "psychotype_description": "Краткий вывод по психотипу сотрудника"\n'
+            "}\n"
+        )
+
+        # Получаем ответ от LLM API
+        evaluation = self.evaluate_reviews_with_llm(prompt)
+
+        # Логируем ответ для отладки
+        print("EVALUATION RESPONSE:", evaluation)
+
+        try:
+            return parse_llm_json(evaluation, validate_psychotype, 'psychotype')
+        except LLMJSONError:
+            # Значения по умолчанию, если JSON не найден или некорректен
+            return {
+                "psychotype": "Не определен",
+                "psychotype_description": "Нет описания"
+            }
+
+    def prepare_prompts(self, reviews, aspects=None):
+        # aspects — тексты оцениваемых аспектов, по умолчанию весь каталог
+        if aspects is None:
+            aspects = Aspect.objects.values_list('text', flat=True)
+        aspect_list = '\n'.join([f"{idx + 1}. {aspect}" for idx, aspect in enumerate(aspects)])
+        base_prompt = (
+            "Вот несколько отзывов(и их веса) о сотруднике:\n\n"
+            "На основе этих отзывов и их весов, максимально объективно оцени сотрудника по шкале от 1 до 5 (оценка не обязательно должна быть целой)(учитывай веса отзывов. Ну тоесть чем меньше вес, тем меньше отзыв должен влиять на итоговую оценку аспекта. Если вес нулевой, то тогда этот отзыв вообще не должен учитываться) по следующим критериям:\n"
+            f"{aspect_list}\n"
+            "Добавьте краткое объяснение к каждому набранному баллу. Не ссылайся на какие-то конкретные отзывы в объяснениях. "
+            "Также, основываясь на всей этой информации, сделай краткий вывод по сотруднику.\n"
+            "Верните ответ в формате JSON, со следующей структурой(Аспект Профессионализм дан для примера, а так, анализ должен проихводиться по каждому аспекту который указан чуть выше):\n\n"
+            "{\n"
+            '  "Профессионализм": {"score": (определи общую оценку данного аспекта), "description": "Краткий вывод по этому аспекту"},\n'
+            '  "Вывод": {"score": (определи общую оценку сотрудника), "description": "вывод по сотруднику"}\n'
+            "}"
+        )
+
+        # Отзывы с нулевым весом модель все равно должна игнорировать — не тратим на них токены.
+        # Остальные раскладываются по промтам так, чтобы промтов было как можно меньше
+        weighted = [review for review in reviews if review['weight'] > 0]
+        review_texts = [f"(вес: {review['weight']:.2f}):\n{review['text']}\n\n" for review in weighted]
+        # Запас под номер отзыва, который добавляется после упаковки
+        sizes = [estimate_tokens(text) + 2 for text in review_texts]
+        capacity = max(1, self.MAX_PROMPT_TOKENS - estimate_tokens(base_prompt))
+        chunks = pack_first_fit_decreasing(sizes, capacity)
+
+        stats = packing_stats(sizes, chunks, capacity)
+        stats["dropped_zero_weight"] = len(reviews) - len(weighted)
+        self.packing_stats.append(stats)
+        print("Упаковка отзывов:", stats)
+
+        prompts = [
+            base_prompt + "".join(f"Отзыв {i} {review_texts[index]}" for i, index in enumerate(chunk, start=1))
+            for chunk in chunks
+        ]
+        chunk_weights = [sum(weighted[index]['weight'] for index in chunk) for chunk in chunks]
+        return prompts, chunk_weights
+
+    def get_consolidated_summary(self, all_summaries, with_scores=True):
+        # Иерархическое объединение: сводки группируются в пачки, умещающиеся в MAX_PROMPT_LENGTH,
+        # каждый уровень объединяется параллельно, пока не останется один результат.
+        # with_scores=False — оценки считаются локально, от LLM нужны только описания
+        summaries = list(all_summaries)
+        levels = []
+        while True:
+            started = time.monotonic()
+            batches = self.pack_consolidation_batches(summaries, with_scores)
+            evaluations = self.evaluate_prompts([self.consolidation_prompt(batch, with_scores) for batch in batches])
+            results = [self.parse_consolidation(evaluation, with_scores) for evaluation in evaluations]
+            levels.append({
+                "inputs": len(summaries),
+                "batches": len(batches),
+                "max_fan_in": max(len(batch) for batch in batches),
+                "seconds": round(time.monotonic() - started, 3)
+            })
+            self.emit("consolidation", level=len(levels), **levels[-1])
+
+            if len(results) == 1:
+                break
+            if len(levels) >= self.MAX_CONSOLIDATION_DEPTH:
+                raise SummaryError("Превышена глубина объединения сводок.")
+            summaries = [result if isinstance(result, str) else json.dumps(result, ensure_ascii=False) for result in results]
+
+        stats = {"depth": len(levels), "levels": levels}
+        self.consolidation_stats.append(stats)
+        print("Объединение сводок:", stats)
+        return results[0]
+
+    def pack_consolidation_batches(self, summaries, with_scores=True):
+        # Жадная упаковка по порядку: новая пачка начинается, когда следующая сводка не помещается
+        # в бюджет. Пачка из одной большой сводки допустима — LLM сожмет ее, и на следующем уровне
+        # результат уже объединится с соседями; бесконечное повторение ограничивает MAX_CONSOLIDATION_DEPTH
+        budget = self.MAX_PROMPT_LENGTH - len(self.consolidation_prompt([], with_scores))
+        batches = [[]]
+        used = 0
+        for summary in summaries:
+            size = len(summary) + 2  # Сводки разделяются пустой строкой
+            if batches[-1] and used + size > budget:
+                batches.append([])
+                used = 0
+            batches[-1].append(summary)
+            used += size
+        return batches
+
+    def consolidation_prompt(self, summaries, with_scores=True):
+        # Формируем финальный запрос на основе промежуточных данных
+        if not with_scores:
+            # Оценки считаются без LLM — просим только объединить описания
+            return (
+                "Вот сводки по нескольким аспектам сотрудника основе отзывов о нем:\n\n"
+                + "\n\n".join(summaries) +
+                "\n\nОбъедини описания по каждому аспекту, который есть во входящих данных, в одно краткое описание. Оценки не нужны. Верните ответ в формате JSON, со следующей структурой(Аспект Профессионализм дан для примера, а так, анализ должен проихводиться по каждому аспекту который содержится в сводках выше):\n\n"
+                "{\n"
+                '  "Профессионализм": {"description": "Краткий вывод по этому аспекту"},\n'
+                '  "Вывод": {"description": "Краткий вывод по сотруднику"}\n'
+                "}"
+            )
+        return (
+            "Вот сводки по нескольким аспектам сотрудника основе отзывов о нем:\n\n"
+            + "\n\n".join(summaries) +
+            "\n\nВ ответе должен содержаться итоговый ответ и оценка по каждому аспекту который есть во входящих данных. Верните ответ в формате JSON, со следующей структурой(Аспект Профессионализм дан для примера, а так, анализ должен проихводиться по каждому аспекту который содержится в сводках выше):\n\n"
+            "{\n"
+            '  "Профессионализм": {"score": (определи общую оценку данного аспекта), "description": "Краткий вывод по этому аспекту"},\n'
+            '  "Вывод": {"score": (определи общую оценку сотрудника), "description": "Краткий вывод по сотруднику"}\n'
+            "}"
+        )
+
+    def parse_consolidation(self, evaluation, with_scores=True):
+        try:
+            return parse_llm_json(evaluation, lambda data: validate_summary(data, require_score=with_scores), 'consolidation')
+        except LLMJSONError:
+            raise SummaryError("Не удалось декодировать JSON из ответа LLM.")
+
+    def evaluate_reviews_with_llm(self, prompt):
+        prompt = prompt.replace("'", '"')  # Замена одинарных кавычек на двойные
+        return get_llm_client().generate(prompt, use_cache=self.use_cache, usage=self.usage)
+
+    def evaluate_reviews_batch(self, prompts):
+        prompts = [prompt.replace("'", '"') for prompt in prompts]  # Замена одинарных кавычек на двойные
+        return get_llm_client().generate_batch(prompts, use_cache=self.use_cache, max_batch_size=self.MAX_BATCH_SIZE, usage=self.usage)
+
+    def clean_summary_text(self, evaluation):
+        # Если это текстовый ответ, возвращаем его сразу
+        if "text_response" in evaluation:
+            return evaluation["text_response"].strip()
+        
+        # Если это JSON-ответ, обрабатываем его как раньше
+        clean_text = re.sub(r"^\*\*\d+\..*\n", "", json.dumps(evaluation, ensure_ascii=False), flags=re.MULTILINE)
+        return clean_text.strip()
@@ -1,3 +1,99 @@
-from django.test import TestCase
+from django.test import Client, SimpleTestCase, TestCase
 
-# Create your tests here.
+from .aspects import catalog_version, outdated_summaries, stale_aspects
+from .llm_json import LLMJSONError, parse_llm_json, validate_summary
+from .models import Aspect, AspectSummary, Employee, EmployeeDataVersion, Feedback, FeedbackLengthStats, GeneralSummary, ReviewCreator
+from .summary import SummaryGenerator
+from .utils import update_aspect_summaries
+
+
+class EmployeeDeleteTests(TestCase):
+    def setUp(self):
+        self.employee = Employee.objects.create(id=1)
+        self.reviewer = ReviewCreator.objects.create(id=2)
+        for text in ("Хорошо работает в команде", "Всегда помогает коллегам"):
+            Feedback(employee=self.employee, review_creator=self.reviewer, text=text).save()
+
+    def test_delete_employee_with_feedback(self):
+        self.employee.delete()
+        self.assertFalse(Employee.objects.filter(id=1).exists())
+        self.assertFalse(Feedback.objects.exists())
+        self.assertFalse(EmployeeDataVersion.objects.filter(employee_id=1).exists())
+
+    def test_delete_employees_queryset(self):
+        Employee.objects.filter(id=1).delete()
+        self.assertFalse(FeedbackLengthStats.objects.filter(employee_id=1).exists())
+        self.assertFalse(EmployeeDataVersion.objects.filter(employee_id=1).exists())
+
+    def test_delete_feedback_bumps_version(self):
+        version, _ = EmployeeDataVersion.current(1)
+        Feedback.objects.first().delete()
+        self.assertEqual(EmployeeDataVersion.current(1)[0], version + 1)
+
+
+class EmployeeDataVersionTests(TestCase):
+    def setUp(self):
+        self.employee = Employee.objects.create(id=1)
+        self.summary = GeneralSummary.objects.create(employee=self.employee, text="Вывод", score=4)
+
+    def test_summary_and_psychotype_changes_bump_version(self):
+        version, _ = EmployeeDataVersion.current(1)
+        aspect_summary = AspectSummary.objects.create(employee=self.employee, general_summary=self.summary, aspect_name="Аспект", text="Текст", score=4)
+        aspect_summary.delete()
+        self.employee.psychotype = "INTJ"
+        self.employee.save()
+        self.summary.delete()
+        self.assertEqual(EmployeeDataVersion.current(1)[0], version + 4)
+
+    def test_etag_depends_on_endpoint_and_params(self):
+        client = Client()
+        feedback = client.get('/reviews/api/feedback/1')
+        self.assertNotEqual(feedback['ETag'], client.get('/reviews/api/feedback/1?limit=1')['ETag'])
+        response = client.get('/reviews/api/employee/1/psychotype', headers={'If-None-Match': feedback['ETag']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(client.get('/reviews/api/feedback/1', headers={'If-None-Match': feedback['ETag']}).status_code, 304)
+
+
+class AspectCatalogVersionTests(TestCase):
+    def test_version_never_repeats_after_delete(self):
+        Aspect.objects.create(text="Профессионализм")
+        newest = Aspect.objects.create(text="Креативность")
+        summary = GeneralSummary.objects.create(employee=Employee.objects.create(id=1), text="Вывод", score=4, aspect_catalog_version=catalog_version())
+        newest.delete()
+        added = Aspect.objects.create(text="Лидерство")
+        self.assertGreater(added.version, summary.aspect_catalog_version)
+        self.assertEqual(list(outdated_summaries()), [summary])
+        self.assertIn(added, stale_aspects(summary))
+
+
+class LLMJSONTests(SimpleTestCase):
+    def test_skips_candidates_that_fail_validation(self):
+        text = 'Оценки в диапазоне [1, 5]. Ответ:\n{"Профессионализм": {"score": 4, "description": "Хорошо"}}'
+        self.assertEqual(
+            parse_llm_json({"text_response": text}, validate_summary),
+            {"Профессионализм": {"score": 4.0, "description": "Хорошо"}}
+        )
+
+    def test_no_valid_candidate(self):
+        with self.assertRaises(LLMJSONError):
+            parse_llm_json({"text_response": "Оценки в диапазоне [1, 5]."}, validate_summary)
+
+
+class UpdateAspectSummariesTests(TestCase):
+    def test_repeated_update_does_not_duplicate_rows(self):
+        aspect = Aspect.objects.create(text="Лидерство")
+        summary = GeneralSummary.objects.create(employee=Employee.objects.create(id=1), text="Вывод", score=4)
+        update_aspect_summaries(summary, [aspect], {"Лидерство": {"score": 3, "description": "Первая оценка"}})
+        update_aspect_summaries(summary, [aspect], {"Лидерство": {"score": 5, "description": "Вторая оценка"}})
+        self.assertEqual(list(summary.aspect_summaries.values_list('aspect_id', 'score')), [(aspect.id, 5.0)])
+
+
+class ConsolidationBatchTests(SimpleTestCase):
+    def test_large_summaries_are_not_forced_into_one_batch(self):
+        generator = SummaryGenerator()
+        budget = generator.MAX_PROMPT_LENGTH - len(generator.consolidation_prompt([]))
+        large = 'а' * (budget // 2 + 10)
+        batches = generator.pack_consolidation_batches([large, large, 'короткая сводка'])
+        self.assertEqual([len(batch) for batch in batches], [1, 2])
+        for batch in batches:
+            self.assertLessEqual(len(generator.consolidation_prompt(batch)), generator.MAX_PROMPT_LENGTH)
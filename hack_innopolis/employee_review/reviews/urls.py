@@ -5,7 +5,10 @@ from .views import *
 
 urlpatterns = [
     path('api/feedback', FeedbackCreateView.as_view(), name='feedback-create'),
+    path('api/feedback/upload', FeedbackUploadView.as_view(), name='feedback-upload'),  # Потоковая загрузка NDJSON/CSV
     path('api/feedback/generate-summary/<int:employee_id>', FeedbackGenerateSummaryView.as_view(), name='generate-summary'),
+    path('api/feedback/generate-summary/<int:employee_id>/stream', FeedbackGenerateSummaryStreamView.as_view(), name='generate-summary-stream'),  # Прогресс генерации через SSE
+    path('api/feedback/refresh-aspects/<int:employee_id>', FeedbackRefreshAspectsView.as_view(), name='refresh-aspects'),  # Переоценка новых и измененных аспектов
 
     # path('api/aspects/', AspectListView.as_view(), name='aspect-list'),
 
@@ -14,6 +17,11 @@ urlpatterns = [
     path('api/feedback/<int:employee_id>', FeedbackByEmployeeView.as_view(), name='feedback-by-employee'),  # Получение отзывов для сотрудника
     path('api/aspect-summaries/<int:employee_id>', AspectSummaryByEmployeeView.as_view(), name='aspect-summary-by-employee'), # Получение всех AspectSummary по employee_id
     path('api/general-summaries/<int:employee_id>', GeneralSummaryByEmployeeView.as_view(), name='general-summary-by-employee'), # Для получения всех Generalsumm пользователя
+    path('api/summary/latest/<int:employee_id>', LatestSummaryView.as_view(), name='latest-summary'), # Последний запуск генерации: общий вывод и аспекты
     path('api/employee/<int:employee_id>/psychotype', EmployeePsychotypeView.as_view(), name='employee-psychotype'), # Информация о психотипе сотрудника
+    path('api/jobs/<int:job_id>', JobStatusView.as_view(), name='job-status'), # Статус и результат фоновой задачи
+    path('api/llm/cache-stats', LLMCacheStatsView.as_view(), name='llm-cache-stats'), # Счетчики кеша ответов LLM
+    path('api/cache-stats', ResponseCacheStatsView.as_view(), name='response-cache-stats'), # Счетчики кеша ответов по сотрудникам
+    path('api/llm/parse-stats', LLMParseStatsView.as_view(), name='llm-parse-stats'), # Счетчики разбора JSON из ответов LLM
     path('api/employees/feedback-count', EmployeeFeedbackCountView.as_view(), name='employee-feedback-count'), # Получение всех сотрудников, их психотипы и количество отзывов о них
 ]
\ No newline at end of file
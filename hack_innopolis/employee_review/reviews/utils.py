@@ -1,12 +1,14 @@
 import json
 import re
 import requests
+from .aspects import catalog_version, match_aspect
+from .llm_json import to_score
 from .models import Employee, GeneralSummary, AspectSummary, Aspect
 
 
 
 
-def save_feedback_summary(employee_id, summary_text, psychotype_data):
+def save_feedback_summary(employee_id, summary_text, psychotype_data, feedback_ids=None, reviews_weight=0.0):
     try:
         employee = Employee.objects.get(id=employee_id)
     except Employee.DoesNotExist:
@@ -27,13 +29,26 @@ def save_feedback_summary(employee_id, summary_text, psychotype_data):
     general_score = general_summary.get('score', 0)
     general_description = general_summary.get('description', '')
 
-    # Создаем общий обзор
-    GeneralSummary.objects.create(
+    # Создаем общий обзор. Версия каталога читается до списка аспектов, чтобы изменение
+    # каталога во время сохранения не пометило сводку актуальной
+    version = catalog_version()
+    aspects = list(Aspect.objects.all())
+    general_summary = GeneralSummary.objects.create(
         employee=employee,
         text=general_description,
-        score=general_score
+        score=general_score,
+        reviews_weight=reviews_weight,
+        aspect_catalog_version=version
     )
 
+    # Запоминаем, какие отзывы учтены в сводке (нужно для инкрементального обновления)
+    if feedback_ids:
+        through = GeneralSummary.feedback.through
+        through.objects.bulk_create(
+            [through(generalsummary_id=general_summary.id, feedback_id=feedback_id) for feedback_id in feedback_ids],
+            batch_size=500
+        )
+
     # Обрабатываем и сохраняем сводки по аспектам
     for aspect_name, data in summary_data.items():
         if aspect_name == 'Вывод':
@@ -43,9 +58,13 @@ def save_feedback_summary(employee_id, summary_text, psychotype_data):
         description = data.get('description', '')
 
         # Всегда создаем новый объект AspectSummary
+        aspect = match_aspect(aspect_name, aspects)
         AspectSummary.objects.create(
             employee=employee,
+            general_summary=general_summary,
             aspect_name=aspect_name,
+            aspect=aspect,
+            aspect_version=aspect.version if aspect else None,
             text=description,
             score=score
         )
@@ -53,4 +72,100 @@ def save_feedback_summary(employee_id, summary_text, psychotype_data):
     # Сохраняем психотип
     employee.psychotype = psychotype_data.get("psychotype", "Не определен")
     employee.psychotype_description = psychotype_data.get("psychotype_description", "Нет описания")
-    employee.save()
\ No newline at end of file
+    employee.save()
+
+    return general_summary
+
+
+def update_aspect_summaries(general_summary, aspects, summary_data, version=None):
+    # Переоцененные аспекты записываются в существующую сводку, остальные аспекты не меняются.
+    # version — версия каталога, по которой выбраны аспекты (по умолчанию текущая)
+    existing = list(general_summary.aspect_summaries.all())
+    updated = []
+    for aspect in aspects:
+        data = next((value for name, value in summary_data.items() if match_aspect(name, [aspect])), None)
+        if not isinstance(data, dict):
+            continue
+
+        aspect_summary = next(
+            (item for item in existing if item.aspect_id == aspect.id or (item.aspect_id is None and match_aspect(item.aspect_name, [aspect]))),
+            None
+        )
+        values = {
+            "employee_id": general_summary.employee_id,
+            "aspect_name": aspect.text,
+            "aspect_version": aspect.version,
+            "text": data.get('description', ''),
+            "score": data.get('score', 0),
+        }
+        if aspect_summary is None:
+            # Повторная переоценка того же аспекта обновляет строку, а не добавляет вторую
+            AspectSummary.objects.update_or_create(general_summary=general_summary, aspect=aspect, defaults=values)
+        else:
+            aspect_summary.aspect = aspect
+            for field, value in values.items():
+                setattr(aspect_summary, field, value)
+            aspect_summary.save()
+        updated.append(aspect.text)
+
+    general_summary.aspect_catalog_version = catalog_version() if version is None else version
+    general_summary.save(update_fields=['aspect_catalog_version'])
+    return updated
+
+
+def summary_as_dict(general_summary):
+    # Сводка в том же формате, в котором ее возвращает LLM
+    summary = {
+        aspect_summary.aspect_name: {"score": aspect_summary.score, "description": aspect_summary.text}
+        for aspect_summary in general_summary.aspect_summaries.all()
+    }
+    summary['Вывод'] = {"score": general_summary.score, "description": general_summary.text}
+    return summary
+
+
+def weighted_mean_scores(parts):
+    # Оценки аспектов по нескольким сводкам (пары сводка, вес) — среднее, взвешенное по
+    # суммарному весу отзывов каждой сводки. Порядок аспектов — как в первой сводке, где они есть
+    totals = {}
+    for summary, weight in parts:
+        for aspect_name, data in summary.items():
+            score = to_score(data.get('score')) if isinstance(data, dict) else None
+            if score is None:
+                continue
+            total = totals.setdefault(aspect_name, [0.0, 0.0, 0.0, 0])
+            total[0] += score * max(weight, 0)
+            total[1] += max(weight, 0)
+            total[2] += score
+            total[3] += 1
+
+    return {
+        # Если у всех частей нулевой вес, берем простое среднее
+        aspect_name: round(weighted / weight if weight > 0 else plain / count, 2)
+        for aspect_name, (weighted, weight, plain, count) in totals.items()
+    }
+
+
+def merge_summary_scores(previous, previous_weight, partial, partial_weight):
+    # Оценки по аспектам объединяются взвешенным средним: каждая сторона весит
+    # столько, сколько суммарный вес отзывов, на которых она построена
+    if previous_weight + partial_weight <= 0:
+        previous_weight = partial_weight = 1.0
+
+    merged = {}
+    for aspect_name in list(previous) + [name for name in partial if name not in previous]:
+        old = previous.get(aspect_name) or {}
+        new = partial.get(aspect_name) or {}
+        old_score, new_score = to_score(old.get('score')), to_score(new.get('score'))
+
+        if old_score is None:
+            score = new_score
+        elif new_score is None:
+            score = old_score
+        else:
+            score = (old_score * previous_weight + new_score * partial_weight) / (previous_weight + partial_weight)
+
+        merged[aspect_name] = {
+            "score": round(score, 2) if score is not None else 0,
+            "description": new.get('description') or old.get('description', ''),
+        }
+    return merged
\ No newline at end of file
@@ -1,15 +1,111 @@
-import re
+import asyncio
 import json
-import requests
+import threading
+from datetime import datetime
+from queue import Empty, Queue
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connection
+from django.db.models import Count, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, generics, permissions
-from .models import Employee, Feedback, GeneralSummary, AspectSummary, Aspect
+from .models import Employee, Feedback, GeneralSummary, AspectSummary, Aspect, Job
 from .serializers import FeedbackSerializer, AspectSerializer
-from .utils import save_feedback_summary
+from .summary import SummaryError, SummaryGenerator
+from .ingestion import ingest_feedback_bulk, ingest_feedback_stream, summarize_results
+from .jobs import enqueue, serialize_job
+from .llm_cache import llm_response_cache
+from .llm_json import parse_stats
+from .conditional import conditional_by_employee, conditional_stats
+from .response_cache import cached_by_employee, employee_response_cache
+from .pagination import EPOCH, CursorError, decode_cursor, iter_keyset, keyset_page, page_size
 
 
 
+SSE_KEEPALIVE_INTERVAL = 15  # Секунд между keep-alive комментариями в SSE-потоке
+
+
+def is_flag_set(request, name):
+    params = getattr(request, 'query_params', request.GET)
+    return params.get(name, '').lower() in ('1', 'true', 'yes')
+
+
+def latest_run_id(employee_id):
+    # id последнего запуска генерации — подзапрос только по индексу (employee, created_at)
+    return Subquery(GeneralSummary.latest_for(employee_id).values('id')[:1])
+
+
+def job_accepted_response(job):
+    return Response({"job_id": job.id, "status": job.status}, status=status.HTTP_202_ACCEPTED)
+
+
+FEEDBACK_FIELDS = ('id', 'review_creator_id', 'employee_id', 'text', 'weight', 'is_self_review')
+
+
+def feedback_row(row, with_id=False):
+    # Отзыв из values(): id связанных объектов берутся из колонок FK, без загрузки объектов
+    data = {
+        "ID_reviewer": row['review_creator_id'],
+        "ID_under_review": row['employee_id'],
+        "review": row['text'],
+        "weight": row['weight'],
+        "is_self_review": row['is_self_review']
+    }
+    if with_id:
+        data["id"] = row['id']
+    return data
+
+
+def stream_json_array(rows):
+    yield '['
+    for index, row in enumerate(rows):
+        yield (',' if index else '') + json.dumps(row, ensure_ascii=False, cls=DjangoJSONEncoder)
+    yield ']'
+
+
+def stream_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False, cls=DjangoJSONEncoder) + '\n'
+
+
+def feedback_list_response(request, feedbacks):
+    # Без параметров — прежний список целиком.
+    # ?limit / ?cursor — страница по id с next_cursor; ?export=ndjson|json — потоковая выгрузка всех отзывов
+    params = request.query_params
+    feedbacks = feedbacks.values(*FEEDBACK_FIELDS)
+
+    export = params.get('export')
+    if export:
+        if export not in ('json', 'ndjson'):
+            return Response({"detail": "export: json или ndjson."}, status=status.HTTP_400_BAD_REQUEST)
+        rows = (feedback_row(row, with_id=True) for row in iter_keyset(feedbacks))
+        if export == 'ndjson':
+            return StreamingHttpResponse(stream_ndjson(rows), content_type='application/x-ndjson; charset=utf-8')
+        return StreamingHttpResponse(stream_json_array(rows), content_type='application/json; charset=utf-8')
+
+    if 'limit' in params or 'cursor' in params:
+        try:
+            limit = page_size(params)
+            cursor = decode_cursor(params.get('cursor'), 'id', int)
+        except CursorError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        rows, next_cursor = keyset_page(feedbacks, 'id', False, cursor, limit, 'id')
+        return Response({
+            "results": [feedback_row(row, with_id=True) for row in rows],
+            "next_cursor": next_cursor
+        }, status=status.HTTP_200_OK)
+
+    return Response([feedback_row(row) for row in feedbacks], status=status.HTTP_200_OK)
+
+
 class AspectView(generics.ListCreateAPIView):
     queryset = Aspect.objects.all()
     serializer_class = AspectSerializer
@@ -21,49 +117,49 @@ class AspectDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 
 class FeedbackByEmployeeView(APIView):
+    @conditional_by_employee('feedback')
+    @cached_by_employee('feedback', bypass_params=('export',))
     def get(self, request, employee_id):
         try:
             employee = Employee.objects.get(id=employee_id)
         except Employee.DoesNotExist:
             return Response({"detail": "Сотрудник не найден."}, status=status.HTTP_404_NOT_FOUND)
 
-        feedbacks = Feedback.objects.filter(employee=employee)
-        serialized_feedbacks = [
-            {
-                "ID_reviewer": feedback.review_creator.id,
-                "ID_under_review": feedback.employee.id,
-                "review": feedback.text,
-                "weight": feedback.weight,
-                "is_self_review": feedback.is_self_review
-            }
-            for feedback in feedbacks
-        ]
-        
-        return Response(serialized_feedbacks, status=status.HTTP_200_OK)
+        return feedback_list_response(request, Feedback.objects.filter(employee=employee))
     
 
 class AspectSummaryByEmployeeView(APIView):
+    @conditional_by_employee('aspect-summaries')
+    @cached_by_employee('aspect-summaries')
     def get(self, request, employee_id):
         try:
             employee = Employee.objects.get(id=employee_id)
         except Employee.DoesNotExist:
             return Response({"detail": "Сотрудник не найден."}, status=status.HTTP_404_NOT_FOUND)
 
+        # latest=1 — только выводы последнего запуска генерации (run_id — id общего вывода)
         aspect_summaries = AspectSummary.objects.filter(employee=employee)
+        if is_flag_set(request, 'latest'):
+            aspect_summaries = AspectSummary.objects.filter(general_summary_id=latest_run_id(employee.id))
         serialized_aspect_summaries = [
             {
-                "aspect_name": aspect_summary.aspect_name,
-                "text": aspect_summary.text,
-                "score": aspect_summary.score,
-                "created_at": aspect_summary.created_at
+                "aspect_name": aspect_summary['aspect_name'],
+                "text": aspect_summary['text'],
+                "score": aspect_summary['score'],
+                "created_at": aspect_summary['created_at'],
+                "run_id": aspect_summary['general_summary_id']
             }
-            for aspect_summary in aspect_summaries
+            for aspect_summary in aspect_summaries.order_by('created_at', 'id').values(
+                'aspect_name', 'text', 'score', 'created_at', 'general_summary_id'
+            )
         ]
         
         return Response(serialized_aspect_summaries, status=status.HTTP_200_OK)
 
 
 class GeneralSummaryByEmployeeView(APIView):
+    @conditional_by_employee('general-summaries')
+    @cached_by_employee('general-summaries')
     def get(self, request, employee_id):
         try:
             employee = Employee.objects.get(id=employee_id)
@@ -71,19 +167,47 @@ class GeneralSummaryByEmployeeView(APIView):
             return Response({"detail": "Сотрудник не найден."}, status=status.HTTP_404_NOT_FOUND)
 
         general_summaries = GeneralSummary.objects.filter(employee=employee)
+        if is_flag_set(request, 'latest'):
+            general_summaries = GeneralSummary.objects.filter(id=latest_run_id(employee.id))
         serialized_general_summaries = [
             {
-                "text": general_summary.text,
-                "score": general_summary.score,
-                "created_at": general_summary.created_at
+                "text": general_summary['text'],
+                "score": general_summary['score'],
+                "created_at": general_summary['created_at'],
+                "run_id": general_summary['id']
             }
-            for general_summary in general_summaries
+            for general_summary in general_summaries.order_by('created_at', 'id').values('id', 'text', 'score', 'created_at')
         ]
         
         return Response(serialized_general_summaries, status=status.HTTP_200_OK)
     
 
+class LatestSummaryView(APIView):
+    # Последний запуск генерации сводки целиком: общий вывод и выводы по аспектам этого запуска
+    @conditional_by_employee('latest-summary')
+    @cached_by_employee('latest-summary')
+    def get(self, request, employee_id):
+        general_summary = GeneralSummary.objects.filter(id=latest_run_id(employee_id)).values('id', 'text', 'score', 'created_at').first()
+        if general_summary is None:
+            if not Employee.objects.filter(id=employee_id).exists():
+                return Response({"detail": "Сотрудник не найден."}, status=status.HTTP_404_NOT_FOUND)
+            return Response({"detail": "Сводка по сотруднику еще не создана."}, status=status.HTTP_404_NOT_FOUND)
+
+        aspects = AspectSummary.objects.filter(general_summary_id=general_summary['id']).order_by('id').values(
+            'aspect_name', 'text', 'score', 'created_at'
+        )
+        return Response({
+            "run_id": general_summary['id'],
+            "text": general_summary['text'],
+            "score": general_summary['score'],
+            "created_at": general_summary['created_at'],
+            "aspects": list(aspects)
+        }, status=status.HTTP_200_OK)
+
+
 class EmployeePsychotypeView(APIView):
+    @conditional_by_employee('psychotype')
+    @cached_by_employee('psychotype')
     def get(self, request, employee_id):
         try:
             employee = Employee.objects.get(id=employee_id)
@@ -100,23 +224,70 @@ class EmployeePsychotypeView(APIView):
     
 
 class EmployeeFeedbackCountView(APIView):
+    # Список сотрудников одним запросом: число отзывов, дата последнего отзыва и последняя общая оценка.
+    # Keyset-пагинация: ?ordering=(-)feedback_count|last_feedback_at|created_at, ?limit, ?cursor=next_cursor
+    ORDERINGS = ('feedback_count', 'last_feedback_at', 'created_at')
+
     def get(self, request):
-        employees = Employee.objects.all()
-        data = []
-        for employee in employees:
-            feedback_count = Feedback.objects.filter(employee=employee).count()
-            data.append({
-                'employee_id': employee.id,
-                'created_at': employee.created_at,
-                'psychotype': employee.psychotype,
-                'psychotype_description': employee.psychotype_description,
-                'feedback_count': feedback_count
-            })
-        return Response(data, status=status.HTTP_200_OK)
+        ordering = request.query_params.get('ordering', '-feedback_count')
+        field = ordering.lstrip('-')
+        if field not in self.ORDERINGS:
+            return Response({"detail": f"ordering: одно из {', '.join(self.ORDERINGS)}."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = page_size(request.query_params)
+            cursor = decode_cursor(request.query_params.get('cursor'), ordering, int if field == 'feedback_count' else datetime)
+        except CursorError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        latest_score = GeneralSummary.latest_for(OuterRef('pk')).values('score')[:1]
+        employees = Employee.objects.annotate(
+            feedback_count=Count('feedback'),
+            last_feedback_at=Max('feedback__created_at'),
+            latest_score=Subquery(latest_score),
+        )
+        sort_field = field
+        if field != 'feedback_count':
+            # Пустые даты сортируются как самые ранние
+            sort_field = 'sort_key'
+            employees = employees.annotate(sort_key=Coalesce(field, Value(EPOCH)))
+
+        rows, next_cursor = keyset_page(
+            employees.values('id', 'created_at', 'psychotype', 'psychotype_description', 'feedback_count', 'last_feedback_at', 'latest_score', sort_field),
+            sort_field, ordering.startswith('-'), cursor, limit, ordering
+        )
+        data = [
+            {
+                'employee_id': row['id'],
+                'created_at': row['created_at'],
+                'psychotype': row['psychotype'],
+                'psychotype_description': row['psychotype_description'],
+                'feedback_count': row['feedback_count'],
+                'last_feedback_at': row['last_feedback_at'],
+                'latest_score': row['latest_score'],
+            }
+            for row in rows
+        ]
+        return Response({"results": data, "next_cursor": next_cursor}, status=status.HTTP_200_OK)
 
 
 class FeedbackCreateView(APIView):
     def post(self, request):
+        if not isinstance(request.data, list):
+            return Response({"detail": "Ожидается список отзывов."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Фоновый режим: загрузка ставится в очередь, результат — через api/jobs/<job_id>
+        if is_flag_set(request, 'async'):
+            return job_accepted_response(enqueue('ingest_feedback', {"items": request.data}))
+
+        # Пакетный режим: один проход по БД, результат по каждой строке
+        if request.query_params.get('mode') == 'bulk':
+            results = ingest_feedback_bulk(request.data)
+            return Response({
+                "status": "success",
+                "counts": summarize_results(results),
+                "results": results
+            }, status=status.HTTP_201_CREATED)
+
         # Фильтруем пустые записи
         filtered_data = [
             feedback for feedback in request.data
@@ -133,189 +304,175 @@ class FeedbackCreateView(APIView):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def get(self, request):
-        feedbacks = Feedback.objects.all()
-        serialized_feedbacks = [
-            {
-                "ID_reviewer": feedback.review_creator.id,
-                "ID_under_review": feedback.employee.id,
-                "review": feedback.text,
-                "weight": feedback.weight,
-                "is_self_review": feedback.is_self_review
-            }
-            for feedback in feedbacks
-        ]
-        return Response(serialized_feedbacks, status=status.HTTP_200_OK)
+        return feedback_list_response(request, Feedback.objects.all())
+
+
+class FeedbackUploadView(APIView):
+    # Потоковая загрузка выгрузок отзывов в формате NDJSON или CSV (ID_reviewer, ID_under_review, review).
+    # Тело запроса читается построчно, request.data не используется.
+    CSV_CONTENT_TYPES = ('text/csv', 'application/csv')
+
+    def post(self, request):
+        file_format = request.query_params.get('input')
+        if file_format is None:
+            content_type = request.content_type.split(';')[0].strip().lower()
+            file_format = 'csv' if content_type in self.CSV_CONTENT_TYPES else 'ndjson'
+
+        if file_format not in ('csv', 'ndjson'):
+            return Response({"detail": "Поддерживаются форматы csv и ndjson."}, status=status.HTTP_400_BAD_REQUEST)
+
+        report = ingest_feedback_stream(request.stream or [], file_format)
+        return Response({"status": "success", **report}, status=status.HTTP_201_CREATED)
 
 
 class FeedbackGenerateSummaryView(APIView):
-    MAX_PROMPT_LENGTH = 20000  # Максимальная длина промта в символах
+    def post(self, request, employee_id):
+        try:
+            employee = Employee.objects.get(id=employee_id)
+        except Employee.DoesNotExist:
+            return Response({"detail": "Сотрудник не найден."}, status=status.HTTP_404_NOT_FOUND)
+
+        # no_cache=1 — запросить ответы LLM заново, минуя кеш
+        use_cache = not is_flag_set(request, 'no_cache')
+        # full=1 — пересобрать сводку по всем отзывам, а не только по новым
+        full = is_flag_set(request, 'full')
 
+        if is_flag_set(request, 'async'):
+            return job_accepted_response(enqueue('generate_summary', {"employee_id": employee.id, "use_cache": use_cache, "full": full}))
+
+        try:
+            result = SummaryGenerator(use_cache=use_cache).generate(employee, full=full)
+        except SummaryError as e:
+            return Response({"detail": e.detail}, status=e.status_code)
+
+        return Response(result, status=status.HTTP_200_OK)
+
+
+class FeedbackRefreshAspectsView(APIView):
+    # Переоценка только новых или измененных аспектов в последней сводке сотрудника
     def post(self, request, employee_id):
         try:
             employee = Employee.objects.get(id=employee_id)
         except Employee.DoesNotExist:
             return Response({"detail": "Сотрудник не найден."}, status=status.HTTP_404_NOT_FOUND)
 
-        reviews = Feedback.objects.filter(employee=employee).values("text", "weight")
-        if not reviews:
-            return Response({"detail": "Нет отзывов для данного сотрудника."}, status=status.HTTP_404_NOT_FOUND)
+        use_cache = not is_flag_set(request, 'no_cache')
+        if is_flag_set(request, 'async'):
+            return job_accepted_response(enqueue('refresh_aspects', {"employee_id": employee.id, "use_cache": use_cache}))
 
-        prompts = self.prepare_prompts(reviews)
-        all_summaries = []
-        for prompt in prompts:
-            evaluation = self.evaluate_reviews_with_llm(prompt)
-            if isinstance(evaluation, dict) and "error" in evaluation:
-                return Response({"detail": evaluation["error"]}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        try:
+            result = SummaryGenerator(use_cache=use_cache).refresh_aspects(employee)
+        except SummaryError as e:
+            return Response({"detail": e.detail}, status=e.status_code)
 
-            summary_text = self.clean_summary_text(evaluation)
-            all_summaries.append(summary_text)
+        return Response(result, status=status.HTTP_200_OK)
 
-        consolidated_summary = self.get_consolidated_summary(all_summaries)
-        psychotype_data = self.analyze_psychotype(consolidated_summary)
-        
-        # Сохраняем сводку и психотип
-        save_feedback_summary(employee_id, consolidated_summary, psychotype_data)
 
-        return Response({
-            "message": "Анализ завершен успешно.",
-            "summary": consolidated_summary,
-            "psychotype": psychotype_data
-        }, status=status.HTTP_200_OK)
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
 
-    def analyze_psychotype(self, consolidated_summary):
-        prompt = (
-            f"Вот общая сводка по сотруднику на основе отзывов:\n\n{consolidated_summary}\n\n"
-            "На основе этой информации, определите психотип сотрудника. Верните краткий вывод о психотипе. "
-            "Верни ответ в формате JSON без лишней информации и пояснения:\n"
-            "{\n"
-            '  "psychotype": "психотип сотрудника",\n'
-            '  "psychotype_description": "Краткий вывод по психотипу сотрудника"\n'
-            "}\n"
-        )
 
-        # Получаем ответ от LLM API
-        evaluation = self.evaluate_reviews_with_llm(prompt)
-
-        # Логируем ответ для отладки
-        print("EVALUATION RESPONSE:", evaluation)
-
-        # Проверка типа ответа
-        if isinstance(evaluation, str):
-            # Пробуем преобразовать строку в словарь
-            try:
-                evaluation_dict = json.loads(evaluation)
-                # Проверяем нужные ключи в полученном ответе
-                if "psychotype" in evaluation_dict and "psychotype_description" in evaluation_dict:
-                    return evaluation_dict
-                else:
-                    print("Некорректная структура JSON.")
-            except json.JSONDecodeError:
-                print("Ошибка декодирования JSON:", evaluation)
-        else:
-            print("Ответ не является строкой.")
+def run_generation(employee, use_cache, full, progress):
+    # Генерация сводки с передачей этапов в progress; всегда завершается событием result или error
+    try:
+        progress("result", SummaryGenerator(use_cache=use_cache, progress=progress).generate(employee, full=full))
+    except SummaryError as e:
+        progress("error", {"detail": e.detail, "status": e.status_code})
+    except Exception as e:
+        print("Ошибка генерации сводки:", str(e))
+        progress("error", {"detail": "Ошибка генерации сводки.", "status": 500})
+    finally:
+        connection.close()
 
-        # Значения по умолчанию, если JSON не найден или некорректен
-        return {
-            "psychotype": "Не определен",
-            "psychotype_description": "Нет описания"
-        }
-        
-    def prepare_prompts(self, reviews):
-        aspects = Aspect.objects.values_list('text', flat=True)
-        aspect_list = '\n'.join([f"{idx + 1}. {aspect}" for idx, aspect in enumerate(aspects)])
-        base_prompt = (
-            "Вот несколько отзывов(и их веса) о сотруднике:\n\n"
-            "На основе этих отзывов и их весов, максимально объективно оцени сотрудника по шкале от 1 до 5 (оценка не обязательно должна быть целой)(учитывай веса отзывов. Ну тоесть чем меньше вес, тем меньше отзыв должен влиять на итоговую оценку аспекта. Если вес нулевой, то тогда этот отзыв вообще не должен учитываться) по следующим критериям:\n"
-            f"{aspect_list}\n"
-            "Добавьте краткое объяснение к каждому набранному баллу. Не ссылайся на какие-то конкретные отзывы в объяснениях. "
-            "Также, основываясь на всей этой информации, сделай краткий вывод по сотруднику.\n"
-            "Верните ответ в формате JSON, со следующей структурой(Аспект Профессионализм дан для примера, а так, анализ должен проихводиться по каждому аспекту который указан чуть выше):\n\n"
-            "{\n"
-            '  "Профессионализм": {"score": (определи общую оценку данного аспекта), "description": "Краткий вывод по этому аспекту"},\n'
-            '  "Вывод": {"score": (определи общую оценку сотрудника), "description": "вывод по сотруднику"}\n'
-            "}"
-        )
 
-        prompts = []
-        current_prompt = base_prompt
-        for i, review in enumerate(reviews, start=1):
-            review_text = f"Отзыв {i} (вес: {review['weight']}):\n{review['text']}\n\n"
-            if len(current_prompt) + len(review_text) > self.MAX_PROMPT_LENGTH:
-                prompts.append(current_prompt)
-                current_prompt = base_prompt  # Сбрасываем промт и добавляем базовый текст
-            current_prompt += review_text
-
-        if current_prompt:
-            prompts.append(current_prompt)
-
-        print(f"CURRENT PROMT: {current_prompt}")
-
-        return prompts
-
-    def get_consolidated_summary(self, all_summaries):
-        # Формируем финальный запрос на основе промежуточных данных
-        prompt = (
-            "Вот сводки по нескольким аспектам сотрудника основе отзывов о нем:\n\n"
-            + "\n\n".join(all_summaries) +
-            "\n\nВ ответе должен содержаться итоговый ответ и оценка по каждому аспекту который есть во входящих данных. Верните ответ в формате JSON, со следующей структурой(Аспект Профессионализм дан для примера, а так, анализ должен проихводиться по каждому аспекту который содержится в сводках выше):\n\n"
-            "{\n"
-            '  "Профессионализм": {"score": (определи общую оценку данного аспекта), "description": "Краткий вывод по этому аспекту"},\n'
-            '  "Вывод": {"score": (определи общую оценку сотрудника), "description": "Краткий вывод по сотруднику"}\n'
-            "}"
-        )
+async def summary_events(employee, use_cache, full):
+    # ASGI: генерация идет в отдельном потоке, события передаются в цикл событий через очередь.
+    # Ожидание клиента не занимает поток: пока LLM думает, соединение обслуживает только event loop
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
 
-        evaluation = self.evaluate_reviews_with_llm(prompt)
-        
-        # Проверка на JSON-ответ
-        if isinstance(evaluation, dict) and "text_response" in evaluation:
-            # Пытаемся преобразовать текстовый ответ в JSON
-            try:
-                evaluation_json = json.loads(evaluation["text_response"])
-                return evaluation_json
-            except json.JSONDecodeError:
-                raise Exception("Не удалось декодировать JSON из текстового ответа.")
-
-        # Возвращаем JSON-ответ, если он корректно разобран
-        return evaluation
-
-    def evaluate_reviews_with_llm(self, prompt):
-        prompt = prompt.replace("'", '"')  # Замена одинарных кавычек на двойные
-        data = {
-            "prompt": [prompt],
-            "apply_chat_template": True,
-            "system_prompt": "You are a helpful assistant.",
-            "max_tokens": 2000,
-            "n": 1,
-            "temperature": 0.3
-        }
-        headers = {"Content-Type": "application/json"}
+    def progress(event, data):
+        loop.call_soon_threadsafe(events.put_nowait, (event, data))
+
+    # Если клиент отключится, генерация все равно завершится и сохранит сводку
+    task = asyncio.ensure_future(sync_to_async(run_generation, thread_sensitive=False)(employee, use_cache, full, progress))
+    while True:
         try:
-            response = requests.post(
-                "https://vk-scoreworker-case.olymp.innopolis.university/generate",
-                data=json.dumps(data), headers=headers
-            )
-            response.raise_for_status()
-
-            # Попытка парсинга как JSON
-            try:
-                json_response = response.json()
-                print("Ответ от LLM API (JSON):", json_response)
-                return json_response  # Возвращаем JSON-ответ, если парсинг успешен
-            except json.JSONDecodeError:
-                # Обработка текстового ответа
-                raw_text_response = response.text.strip()
-                print("Ответ от LLM API (текст):", raw_text_response)
-                return {"text_response": raw_text_response}  # Возвращаем текст в словаре
-
-        except requests.exceptions.RequestException as e:
-            print("Ошибка запроса к LLM:", str(e))
-            return {"error": f"Ошибка запроса к LLM: {str(e)}"}
-
-    def clean_summary_text(self, evaluation):
-        # Если это текстовый ответ, возвращаем его сразу
-        if "text_response" in evaluation:
-            return evaluation["text_response"].strip()
-        
-        # Если это JSON-ответ, обрабатываем его как раньше
-        clean_text = re.sub(r"^\*\*\d+\..*\n", "", json.dumps(evaluation, ensure_ascii=False), flags=re.MULTILINE)
-        return clean_text.strip()
+            event, data = await asyncio.wait_for(events.get(), timeout=SSE_KEEPALIVE_INTERVAL)
+        except asyncio.TimeoutError:
+            yield ": keep-alive\n\n"
+            continue
+        yield sse_event(event, data)
+        if event in ("result", "error"):
+            break
+    await task
+
+
+def summary_events_sync(employee, use_cache, full):
+    # WSGI (runserver, gunicorn): асинхронный итератор там буферизуется до конца ответа,
+    # поэтому события отдаются обычным генератором из потока генерации
+    events = Queue()
+    threading.Thread(
+        target=run_generation, args=(employee, use_cache, full, lambda event, data: events.put((event, data))),
+        name=f'summary-stream-{employee.id}'
+    ).start()
+    while True:
+        try:
+            event, data = events.get(timeout=SSE_KEEPALIVE_INTERVAL)
+        except Empty:
+            yield ": keep-alive\n\n"
+            continue
+        yield sse_event(event, data)
+        if event in ("result", "error"):
+            break
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class FeedbackGenerateSummaryStreamView(View):
+    # Потоковый вариант generate-summary (text/event-stream): события chunks, chunk (с оценками части),
+    # consolidation, psychotype, saved и итоговое result или error. Под ASGI соединение не занимает поток
+    async def post(self, request, employee_id):
+        employee = await Employee.objects.filter(id=employee_id).afirst()
+        if employee is None:
+            return JsonResponse({"detail": "Сотрудник не найден."}, status=status.HTTP_404_NOT_FOUND)
+
+        stream = summary_events if isinstance(request, ASGIRequest) else summary_events_sync
+        events = stream(employee, use_cache=not is_flag_set(request, 'no_cache'), full=is_flag_set(request, 'full'))
+        response = StreamingHttpResponse(events, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # Отключаем буферизацию в nginx
+        return response
+
+    # EventSource в браузере умеет только GET
+    async def get(self, request, employee_id):
+        return await self.post(request, employee_id)
+
+
+class JobStatusView(APIView):
+    def get(self, request, job_id):
+        try:
+            job = Job.objects.get(id=job_id)
+        except Job.DoesNotExist:
+            return Response({"detail": "Задача не найдена."}, status=status.HTTP_404_NOT_FOUND)
+
+        return Response(serialize_job(job), status=status.HTTP_200_OK)
+
+
+class LLMCacheStatsView(APIView):
+    def get(self, request):
+        return Response(llm_response_cache.stats(), status=status.HTTP_200_OK)
+
+
+class ResponseCacheStatsView(APIView):
+    # Попадания и промахи кеша ответов по сотрудникам и число ответов 304 (с момента запуска процесса)
+    def get(self, request):
+        return Response({
+            **employee_response_cache.stats(),
+            "conditional": conditional_stats.as_dict()
+        }, status=status.HTTP_200_OK)
+
+
+class LLMParseStatsView(APIView):
+    # Сколько ответов LLM разобрано сразу, после исправления и не разобрано (с момента запуска процесса)
+    def get(self, request):
+        return Response(parse_stats.as_dict(), status=status.HTTP_200_OK)
@@ -0,0 +1,75 @@
+import numpy as np
+
+
+
+def emotion_weight(polarity):
+    # Чем ближе полярность к 0, тем больше вес
+    return 1 - abs(polarity)
+
+
+def std_weight(count, mean, m2, max_length):
+    # Вес на основе стандартного отклонения длин отзывов сотрудника
+    if count < 2:
+        return 1.0  # Если отзывов недостаточно, возвращаем максимальный вес
+    if not max_length:
+        return 0.0
+
+    std_dev = np.sqrt(max(m2, 0) / count)
+    weight = 1 - std_dev / max_length  # Нормализуем на максимальную длину
+    return float(max(0, min(weight, 1)))
+
+
+def prefix_std_weights(count, mean, m2, max_length, new_lengths):
+    # Векторный расчет весов для пачки новых отзывов одного сотрудника.
+    # Результат совпадает с последовательным сохранением отзывов по одному:
+    # k-й отзыв получает вес по статистике существующих отзывов и первых k новых.
+    new = np.asarray(new_lengths, dtype=float)
+    if new.size == 0:
+        return new
+
+    total = mean * count
+    total_sq = m2 + count * mean ** 2
+
+    counts = count + np.arange(1, new.size + 1)
+    sums = total + np.cumsum(new)
+    sums_sq = total_sq + np.cumsum(new ** 2)
+    maxes = np.maximum.accumulate(np.maximum(new, max_length or 0))
+
+    means = sums / counts
+    std_dev = np.sqrt(np.maximum(sums_sq / counts - means ** 2, 0))
+
+    weights = np.zeros_like(new)
+    np.divide(std_dev, maxes, out=weights, where=maxes > 0)
+    weights = np.where(maxes > 0, 1 - weights, 0.0)
+    weights = np.where(counts < 2, 1.0, weights)
+    return np.clip(weights, 0, 1)
+
+
+def combine_weights(std_weights, emotion_weights, is_self_review):
+    # Итоговый вес: самооценка обнуляется, затем корректировка на эмоциональность
+    weights = np.asarray(std_weights, dtype=float) * np.asarray(emotion_weights, dtype=float)
+    weights = np.where(np.asarray(is_self_review, dtype=bool), 0.0, weights)
+    return np.clip(weights, 0, 1)
+
+
+def grouped_std_weights(group_index, lengths):
+    # Веса по стандартному отклонению для всех отзывов сразу нескольких сотрудников.
+    # group_index — номер сотрудника (0..k-1) для каждого отзыва
+    group_index = np.asarray(group_index)
+    lengths = np.asarray(lengths, dtype=float)
+    if lengths.size == 0:
+        return lengths
+
+    groups = group_index.max() + 1
+    counts = np.bincount(group_index, minlength=groups)
+    means = np.bincount(group_index, weights=lengths, minlength=groups) / np.maximum(counts, 1)
+    deviations = lengths - means[group_index]
+    std_dev = np.sqrt(np.bincount(group_index, weights=deviations ** 2, minlength=groups) / np.maximum(counts, 1))
+    maxes = np.zeros(groups)
+    np.maximum.at(maxes, group_index, lengths)
+
+    weights = np.zeros(groups)
+    np.divide(std_dev, maxes, out=weights, where=maxes > 0)
+    weights = np.where(maxes > 0, 1 - weights, 0.0)
+    weights = np.where(counts < 2, 1.0, weights)
+    return np.clip(weights, 0, 1)[group_index]